@@ -1,163 +1,217 @@
-import configparser
 import os
 import sys
-import datetime
-import re
-from sshconnect import ssh_connect, send_command, logger  # Import from sshconnect.py
+from sshconnect import (clean_output, setup_cli_logging, logger, DEFAULT_PLATFORM,
+                        COMMAND_ERROR_MARKERS)  # Import from sshconnect.py
+from session_pool import session_pool
+from fleet import poll_fleet, read_fleet_inventory, format_fleet_summary
+from inventory import get_inventory
+from instrumentation import instrumentation, profile_call
+from parsers import parse_interface_status, port_sort_key
+from link_events import flap_tracker
+from transcript_archive import TranscriptArchive, ARCHIVE_DIR
 
 INVENTORY_PATH = r"D:\Switch Monitoring tool\inventory.ini"
+ARCHIVE_PATH = ARCHIVE_DIR
 
 def read_inventory(selected_host):
     """
-    Read connection details for a specific host from inventory.ini
+    Connection details for a specific host from the cached inventory.ini
     """
-    config = configparser.ConfigParser()
-    config.read(INVENTORY_PATH)
-
-    section = 'switches'
-    if section not in config:
-        raise Exception(f"Section '{section}' not found in inventory.ini")
-
-    if selected_host not in config[section]:
+    host_info = get_inventory(INVENTORY_PATH).get(selected_host)
+    if host_info is None:
         raise Exception(f"{selected_host} not found in inventory.ini")
-
-    return {
-        'host': config[section][selected_host],
-        'username': config[section].get('username', ''),
-        'password': config[section].get('password', '')
-    }
-
-def get_gigabit_ports(channel):
+    return host_info
+
+STATUS_COMMAND = 'show interfaces status'
+LOG_COMMAND = 'show log'
+INTERFACES_COMMAND = 'show interfaces'
+# Flap tracking only needs link up/down lines, so the switch filters its log
+# before sending it; switches that reject the filter get the plain command
+LOG_FILTER = ' | include %LINK'
+
+# Switches that rejected LOG_FILTER
+unfiltered_log_hosts = set()
+
+# (command, section title) pairs run once per switch besides status and log
+INTERFACE_COMMANDS = [
+    (INTERFACES_COMMAND, 'Port Flapping (Interfaces)'),
+    ('show queue statistics', 'Output Drops')
+]
+
+# Section order of the interface report
+INTERFACE_SECTIONS = ['Port Status', 'Speed & Duplex', 'Port Flapping (Logs)',
+                      'Port Flapping (Interfaces)', 'Output Drops', 'CRC Errors', 'Port Counters']
+
+# Bulk per-port counters command and its section title, per device platform.
+# The SB bulk table only has packet and octet columns (no FCS), so its CRC
+# counts come from the 'show interfaces' blocks instead.
+COUNTERS_COMMANDS = {
+    'cisco_sb': ('show interfaces counters', 'Port Counters'),
+    'cisco_ios': ('show interfaces counters errors', 'CRC Errors'),
+}
+
+# Sections holding per-port counter tables
+COUNTER_SECTIONS = ('CRC Errors', 'Port Counters')
+
+def get_gigabit_ports(status_output):
     """
-    Fetch the list of GigabitEthernet ports from 'show interface status'.
+    List the ports reported in 'show interfaces status' output.
     """
-    output = send_command(channel, "show interface status", wait_time=5)
-    ports = []
-    
-    # Regular expression to match GigabitEthernet ports (e.g., Gi1, GigabitEthernet1)
-    port_pattern = re.compile(r'^(Gi|GigabitEthernet)\d+', re.IGNORECASE)
-    
-    for line in output.splitlines():
-        match = port_pattern.search(line.strip())
-        if match:
-            port_name = match.group(0)
-            # Normalize to 'GigabitEthernetX' format
-            if port_name.startswith('Gi'):
-                port_num = port_name[2:]
-                port_name = f"GigabitEthernet{port_num}"
-            ports.append(port_name)
-    
-    return ports
-
-def monitor_interface_port_health(channel):
+    return sorted(parse_interface_status(status_output), key=port_sort_key)
+
+def monitor_interface_port_health(session, on_section=None, policy=None, reused=None):
     """
     Monitor and collect interface and port health metrics for the switch.
+
+    The status table is fetched once and reused for both status sections,
+    and counters for every port come from a single bulk counters query, so
+    the number of commands does not grow with the port count.
+    The commands are independent and run in parallel over the session's
+    shell channels, slowest first. With a PollingPolicy the log and the
+    full 'show interfaces' output are only fetched when their tier is due
+    or the switch is boosted; otherwise their cached output is reported.
+
+    Returns a dict mapping section title to the cleaned command output.
+    If given, on_section(title, output) is called as each command finishes
+    and the titles of sections served from the policy's cache are added
+    to the reused set.
     """
+    collected = {}
+    report = on_section or (lambda title, output: None)
+    counters_command, counters_title = COUNTERS_COMMANDS.get(session.platform, COUNTERS_COMMANDS[DEFAULT_PLATFORM])
+    titles = dict(INTERFACE_COMMANDS + [(counters_command, counters_title)])
+    log_command = LOG_COMMAND if session.host in unfiltered_log_hosts else LOG_COMMAND + LOG_FILTER
+
+    def report_recent_log():
+        collected['Port Flapping (Logs)'] = "\n".join(flap_tracker.recent_lines(session.host))
+        report('Port Flapping (Logs)', collected['Port Flapping (Logs)'])
+
+    def on_result(command, output):
+        output = clean_output(output, command)
+        if command == log_command and command != LOG_COMMAND and any(
+                marker in output for marker in COMMAND_ERROR_MARKERS):
+            logger.warning(f"'{command}' rejected by {session.host}, fetching its whole log from now on")
+            unfiltered_log_hosts.add(session.host)
+            report_recent_log()
+            return
+        if policy:
+            policy.record(session.host, command, output)
+        if command == STATUS_COMMAND:
+            logger.info(f"Detected ports: {get_gigabit_ports(output)}")
+            for title in ('Port Status', 'Speed & Duplex'):
+                collected[title] = output
+                report(title, output)
+        elif command == log_command:
+            # Only log entries newer than the last poll are kept
+            flap_tracker.ingest(session.host, output)
+            report_recent_log()
+        else:
+            collected[titles[command]] = output
+            report(titles[command], output)
+
+    commands = [INTERFACES_COMMAND, counters_command, 'show queue statistics', STATUS_COMMAND]
+    cached = policy.plan(session.host, [INTERFACES_COMMAND, log_command])[1] if policy else {}
+    if INTERFACES_COMMAND in cached:
+        commands.remove(INTERFACES_COMMAND)
+        collected[titles[INTERFACES_COMMAND]] = cached[INTERFACES_COMMAND]
+        report(titles[INTERFACES_COMMAND], cached[INTERFACES_COMMAND])
+        if reused is not None:
+            reused.add(titles[INTERFACES_COMMAND])
+    # Switches already sending syslog to the listener are not polled for their log at all,
+    # and a log polled recently is not fetched again until the policy says so
+    skip_log = flap_tracker.has_live_feed(session.host) or log_command in cached
+    if skip_log:
+        report_recent_log()
+    else:
+        commands.insert(1, log_command)
     try:
-        # Base commands
-        base_commands = [
-            ('show interface status', 'Port Status'),
-            ('show interfaces status', 'Speed & Duplex'),
-            ('show log', 'Port Flapping (Logs)'),
-            ('show interfaces', 'Port Flapping (Interfaces)'),
-            ('show queue statistics', 'Output Drops')
-        ]
-
-        # Get all GigabitEthernet ports
-        gigabit_ports = get_gigabit_ports(channel)
-        logger.info(f"Detected GigabitEthernet ports: {gigabit_ports}")
-
-        # Dynamic CRC error commands for each port
-        crc_commands = [(f"show interfaces counters {port}", f"CRC Errors - {port}") for port in gigabit_ports]
-
-        # Combine all commands
-        commands = base_commands + crc_commands
-
-        for command, section_title in commands:
-            output = send_command(channel, command, wait_time=5)
-            logger.debug(f"{command} output: {output}")
-            print(f"\n=== {section_title} ===")
-            print(output)
-
+        session.send_commands(commands, on_result)
     except Exception as e:
         logger.error(f"Error monitoring interface port health: {e}")
+    return {title: collected[title] for title in INTERFACE_SECTIONS if title in collected}
+
+def format_interface_report(sections):
+    """
+    Render collected sections as the plain-text interface port health report.
+    """
+    lines = ["INTERFACE PORT HEALTH REPORT", "============================", ""]
+    for section, output in sections.items():
+        lines.append(f"\n=== {section} ===")
+        lines.append(output)
+    return "\n".join(lines) + "\n"
 
-def extract_interface_port_info(log_file):
+def archive_interface_port_report(host_id, sections):
     """
-    Extract interface port health data from the log file and save to a text file.
+    Store the sections in the compressed transcript archive and return the run id.
     """
-    sections = {}
-    current_section = None
-    
-    with open(log_file, "r") as file:
-        for line in file:
-            section_match = re.search(r"=== (.*?) ===", line)
-            if section_match:
-                current_section = section_match.group(1)
-                sections[current_section] = []
-                continue
-            
-            if current_section:
-                if "Sending command:" in line:
-                    current_section = None
-                else:
-                    sections[current_section].append(line.strip())
-
-    date_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"interface_port_{date_str}.txt"
-
-    with open(output_file, "w") as f:
-        f.write("INTERFACE PORT HEALTH REPORT\n")
-        f.write("============================\n\n")
-        for section, lines in sections.items():
-            f.write(f"\n=== {section} ===\n")
-            for line in lines:
-                f.write(line + "\n")
-
-    print(f"Extracted data saved to {output_file}")
-    return output_file
-
-def process_host(host_info):
+    archive = TranscriptArchive(ARCHIVE_PATH)
+    try:
+        run_id = archive.store(host_id, 'interface', sections)
+    finally:
+        archive.close()
+    print(f"Transcript archived as run {run_id} "
+          f"(python transcript_archive.py latest {host_id} interface)")
+    return run_id
+
+def process_host(host_info, on_section=None, policy=None, reused=None):
     """
     Process a single host for interface and port health monitoring.
+
+    Returns the collected sections; raises ConnectionError if the switch
+    cannot be reached. Titles of sections reused from the policy's cache
+    are added to reused (a set), if given.
     """
     HOST = host_info['host']
-    USERNAME = host_info['username']
-    PASSWORD = host_info['password']
+    logger.info(f"Processing host: {HOST}")
 
-    print(f"\n===== Processing Host: {HOST} =====")
-    
-    ssh_client, channel = ssh_connect(HOST, USERNAME, PASSWORD)
-    if ssh_client and channel:
-        try:
-            prompts = [{'text': 'User Name:', 'response': USERNAME},
-                       {'text': 'Password:', 'response': PASSWORD}]
-            
-            print("Entering enable mode:")
-            send_command(channel, 'enable', expected_prompts=prompts)
-            
-            monitor_interface_port_health(channel)
-                
-        except Exception as e:
-            logger.error(f"Error processing {HOST}: {e}")
-        finally:
-            if ssh_client:
-                ssh_client.close()
-                logger.info(f"SSH connection to {HOST} closed.")
-                print(f"SSH connection to {HOST} closed.")
-    else:
-        logger.error(f"Failed to establish SSH connection to {HOST}")
+    # Borrow an authenticated, enable-mode session from the shared pool
+    with session_pool.session(host_info) as session:
+        return monitor_interface_port_health(session, on_section, policy, reused)
 
 def main():
     if len(sys.argv) < 2:
-        print("Error: No host selected. Run script with a host argument.")
+        print("Error: No host selected. Run script with a host argument, or --all for the whole fleet.")
+        print("Options: --stats prints collector timings, --profile runs under cProfile.")
         sys.exit(1)
 
-    selected_host = sys.argv[1]
+    setup_cli_logging()
+    options = sys.argv[2:]
+    try:
+        if '--profile' in options:
+            profile_call(run, sys.argv[1])
+        else:
+            run(sys.argv[1])
+    finally:
+        if '--stats' in options:
+            print(instrumentation.format_summary())
+
+def run(selected_host):
+    """
+    Collect from one host, or from the whole fleet for '--all'.
+    """
+    if selected_host == '--all':
+        # Fleet mode: poll every switch in the inventory concurrently
+        try:
+            report = poll_fleet(process_host, read_fleet_inventory(INVENTORY_PATH))
+        finally:
+            session_pool.close_all()
+        print(format_fleet_summary(report))
+        return
+
     host_info = read_inventory(selected_host)
 
-    process_host(host_info)
-    extract_interface_port_info("Switch_monitoring.log")
+    try:
+        sections = process_host(host_info)
+    except Exception as e:
+        logger.error(f"Error processing {host_info['host']}: {e}")
+        sys.exit(1)
+    finally:
+        session_pool.close_all()
+
+    for section, output in sections.items():
+        print(f"\n=== {section} ===")
+        print(output)
+    archive_interface_port_report(selected_host, sections)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
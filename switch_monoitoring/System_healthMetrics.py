@@ -1,139 +1,156 @@
-import configparser
 import os
 import sys
-import datetime
-import re
-from sshconnect import ssh_connect, send_command, logger  # Import from sshconnect.py
+from sshconnect import clean_output, setup_cli_logging, logger  # Import from sshconnect.py
+from session_pool import session_pool
+from fleet import poll_fleet, read_fleet_inventory, format_fleet_summary
+from inventory import get_inventory
+from instrumentation import instrumentation, profile_call
+from transcript_archive import TranscriptArchive, ARCHIVE_DIR
 
 INVENTORY_PATH = r"D:\Switch Monitoring tool\inventory.ini"
+ARCHIVE_PATH = ARCHIVE_DIR
 
 def read_inventory(selected_host):
     """
-    Read connection details for a specific host from inventory.ini
+    Connection details for a specific host from the cached inventory.ini
     """
-    config = configparser.ConfigParser()
-    config.read(INVENTORY_PATH)
-
-    section = 'switches'
-    if section not in config:
-        raise Exception(f"Section '{section}' not found in inventory.ini")
-
-    if selected_host not in config[section]:
+    host_info = get_inventory(INVENTORY_PATH).get(selected_host)
+    if host_info is None:
         raise Exception(f"{selected_host} not found in inventory.ini")
-
-    return {
-        'host': config[section][selected_host],
-        'username': config[section].get('username', ''),
-        'password': config[section].get('password', '')
-    }
-
-def monitor_switch_status(channel):
+    return host_info
+
+# (command, section title) pairs collected for every switch
+SYSTEM_COMMANDS = [
+    ('show version', 'Version Information'),
+    ('show system', 'System Information'),
+    ('show cpu utilization', 'CPU Utilization'),
+    ('show power inline', 'Power Supply Status'),
+    ('show inventory', 'Inventory Information'),
+    ('show voice vlan', 'Voice VLAN Information')
+]
+
+def monitor_switch_status(session, on_section=None, policy=None):
     """
     Monitor and collect various system and interface stats for the switch.
+
+    Commands are independent, so they run in parallel over the session's
+    shell channels (see PooledSession.send_commands). With a PollingPolicy,
+    static data (version, inventory, voice VLAN) is reused from its cache
+    instead of being fetched on every poll.
+
+    Returns a dict mapping section title to the cleaned command output.
+    If given, on_section(title, output) is called as each command finishes.
     """
+    sections = {}
+    titles = dict(SYSTEM_COMMANDS)
+    outputs = {}
+
+    def on_result(command, output):
+        output = clean_output(output, command)
+        outputs[command] = output
+        if policy:
+            policy.record(session.host, command, output)
+        if on_section:
+            on_section(titles[command], output)
+
+    commands = [command for command, _ in SYSTEM_COMMANDS]
+    if policy:
+        commands, reused = policy.plan(session.host, commands)
+        for command, output in reused.items():
+            outputs[command] = output
+            if on_section:
+                on_section(titles[command], output)
     try:
-        commands = [
-            ('show version', 'Version Information'),
-            ('show system', 'System Information'),
-            ('show cpu utilization', 'CPU Utilization'),
-            ('show power inline', 'Power Supply Status'),
-            ('show inventory', 'Inventory Information'),
-            ('show voice vlan', 'Voice VLAN Information')
-        ]
-
-        for command, section_title in commands:
-            # Execute command and get output
-            output = send_command(channel, command, wait_time=5)
-            
-            # Log output for debugging (only visible in log file)
-            logger.debug(f"{command} output: {output}")
-            
-            # Print formatted output to console (only once)
-            print(f"\n=== {section_title} ===")
-            print(output)
-
+        session.send_commands(commands, on_result)
     except Exception as e:
         logger.error(f"Error monitoring switch status: {e}")
+    for command, section_title in SYSTEM_COMMANDS:
+        if command in outputs:
+            sections[section_title] = outputs[command]
+    return sections
 
-def extract_switch_info(log_file):
-    sections = {}
-    current_section = None
-    
-    with open(log_file, "r") as file:
-        for line in file:
-            section_match = re.search(r"=== (.*?) ===", line)
-            if section_match:
-                current_section = section_match.group(1)
-                sections[current_section] = []
-                continue
-            
-            if current_section:
-                if "Sending command:" in line:
-                    current_section = None
-                else:
-                    sections[current_section].append(line.strip())
-
-    # Get current date for filename
-    date_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"basicinfo_{date_str}.txt"
-
-    # Save extracted info to a file
-    with open(output_file, "w") as f:
-        f.write("SWITCH MONITORING REPORT\n")
-        f.write("=======================\n\n")
-        for section, lines in sections.items():
-            f.write(f"\n=== {section} ===\n")
-            for line in lines:
-                f.write(line + "\n")
-
-    print(f"Extracted data saved to {output_file}")
-    return output_file  # Return filename for reference
-
-def process_host(host_info):
+def format_switch_report(sections):
+    """
+    Render collected sections as the plain-text switch monitoring report.
+    """
+    lines = ["SWITCH MONITORING REPORT", "=======================", ""]
+    for section, output in sections.items():
+        lines.append(f"\n=== {section} ===")
+        lines.append(output)
+    return "\n".join(lines) + "\n"
+
+def archive_switch_report(host_id, sections):
+    """
+    Store the sections in the compressed transcript archive and return the run id.
+    """
+    archive = TranscriptArchive(ARCHIVE_PATH)
+    try:
+        run_id = archive.store(host_id, 'system', sections)
+    finally:
+        archive.close()
+    print(f"Transcript archived as run {run_id} "
+          f"(python transcript_archive.py latest {host_id} system)")
+    return run_id
+
+def process_host(host_info, on_section=None, policy=None):
     """
     Process a single host for system monitoring and status.
+
+    Returns the collected sections; raises ConnectionError if the switch
+    cannot be reached.
     """
     HOST = host_info['host']
-    USERNAME = host_info['username']
-    PASSWORD = host_info['password']
+    logger.info(f"Processing host: {HOST}")
 
-    print(f"\n===== Processing Host: {HOST} =====")
-    
-    ssh_client, channel = ssh_connect(HOST, USERNAME, PASSWORD)
-    if ssh_client and channel:
-        try:
-            prompts = [{'text': 'User Name:', 'response': USERNAME},
-                       {'text': 'Password:', 'response': PASSWORD}]
-            
-            print("Entering enable mode:")
-            send_command(channel, 'enable', expected_prompts=prompts)
-            
-            # Monitor Switch Status
-            monitor_switch_status(channel)
-                
-        except Exception as e:
-            logger.error(f"Error processing {HOST}: {e}")
-        finally:
-            if ssh_client:
-                ssh_client.close()
-                logger.info(f"SSH connection to {HOST} closed.")
-                print(f"SSH connection to {HOST} closed.")
-    else:
-        logger.error(f"Failed to establish SSH connection to {HOST}")
+    # Borrow an authenticated, enable-mode session from the shared pool
+    with session_pool.session(host_info) as session:
+        return monitor_switch_status(session, on_section, policy)
 
 def main():
     if len(sys.argv) < 2:
-        print("Error: No host selected. Run script with a host argument.")
+        print("Error: No host selected. Run script with a host argument, or --all for the whole fleet.")
+        print("Options: --stats prints collector timings, --profile runs under cProfile.")
         sys.exit(1)
 
-    selected_host = sys.argv[1]  # Get host from command-line argument
+    setup_cli_logging()
+    options = sys.argv[2:]
+    try:
+        if '--profile' in options:
+            profile_call(run, sys.argv[1])
+        else:
+            run(sys.argv[1])
+    finally:
+        if '--stats' in options:
+            print(instrumentation.format_summary())
+
+def run(selected_host):
+    """
+    Collect from one host, or from the whole fleet for '--all'.
+    """
+    if selected_host == '--all':
+        # Fleet mode: poll every switch in the inventory concurrently
+        try:
+            report = poll_fleet(process_host, read_fleet_inventory(INVENTORY_PATH))
+        finally:
+            session_pool.close_all()
+        print(format_fleet_summary(report))
+        return
+
     host_info = read_inventory(selected_host)
 
     # Process the selected host
-    process_host(host_info)
+    try:
+        sections = process_host(host_info)
+    except Exception as e:
+        logger.error(f"Error processing {host_info['host']}: {e}")
+        sys.exit(1)
+    finally:
+        session_pool.close_all()
 
-    # Extract relevant log info
-    extract_switch_info("Switch_monitoring.log")
+    for section, output in sections.items():
+        print(f"\n=== {section} ===")
+        print(output)
+    archive_switch_report(selected_host, sections)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
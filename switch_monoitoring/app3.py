@@ -1,12 +1,34 @@
-from flask import Flask, render_template, request, jsonify
-import subprocess
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import os
+import math
+import gzip
+import hmac
 import time
-import re
-import configparser
-import glob
+import json
+import queue
+import threading
 from datetime import datetime
 import logging
+import System_healthMetrics as system_metrics
+import Interface_Porthealth_Metrics as interface_metrics
+from fleet import poll_fleet, read_fleet_inventory, MAX_WORKERS, HOST_TIMEOUT
+from snapshot_cache import SnapshotCache
+from scheduler import CollectionScheduler
+from parsers import (build_port_records, parse_cpu_utilization, parse_power_inline, parse_voice_vlan, ports_to_json,
+                     INTERFACE_COUNTERS)
+from rates import RateEngine
+from history import HistoryStore
+from inventory import get_inventory
+from metrics_exporter import PrometheusExporter, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from instrumentation import instrumentation
+from link_events import flap_tracker, SyslogListener
+from logging_setup import configure_logging, rollover_logs
+from polling_policy import polling_policy, interface_change, system_change
+from host_health import host_health, HostUnreachableError
+from port_index import PortIndex, INDEXED_FIELDS, NUMERIC_FIELDS
+from transcript_archive import TranscriptArchive, ARCHIVE_DIR
+from delta_encoding import EncodedResponses, compute_delta, accepted_encoding, compress, MIN_COMPRESS_BYTES
+from cluster import Coordinator, WorkerOwnedError, TOKEN_HEADER, CLUSTER_TOKEN
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
@@ -18,42 +40,370 @@ LOG_FILE = os.path.join(LOG_DIR, "Switch_monitoring.log")
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# Queued, size-rotated logging shared with the in-process collectors;
+# set SWITCH_MONITOR_LOG_LEVEL=DEBUG to include full command output
+configure_logging(LOG_FILE)
 logger = logging.getLogger('SwitchMonitoring')
-logger.setLevel(logging.DEBUG)
-fh = logging.FileHandler(LOG_FILE)
-fh.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-fh.setFormatter(formatter)
-logger.addHandler(fh)
-
-SYSTEM_SCRIPT_PATH = r"D:\Switch Monitoring tool\System_healthMetrics.py"
-INTERFACE_SCRIPT_PATH = r"D:\Switch Monitoring tool\Interface_Porthealth_Metrics.py"
+
 INVENTORY_PATH = r"D:\Switch Monitoring tool\inventory.ini"
+HISTORY_DB_PATH = os.path.join(LOG_DIR, "switch_history.db")
+ARCHIVE_PATH = ARCHIVE_DIR
 
 def get_available_hosts():
-    config = configparser.ConfigParser()
-    config.read(INVENTORY_PATH)
-    hosts = []
-    ip_mapping = {}
-    if 'switches' in config:
-        for key in config['switches']:
-            if key.startswith('host'):
-                host_ip = config['switches'][key]
-                hosts.append((key, host_ip))
-                ip_mapping[key] = host_ip
+    try:
+        inventory = get_inventory(INVENTORY_PATH).hosts()
+    except Exception as e:
+        logger.error(f"Inventory unavailable: {e}")
+        inventory = {}
+    hosts = [(host_id, info['host']) for host_id, info in inventory.items()]
+    ip_mapping = dict(hosts)
     return hosts, ip_mapping
 
+def get_frontend_hosts():
+    inventory = get_inventory(INVENTORY_PATH)
+    hosts, ip_mapping = get_available_hosts()
+    frontend_hosts = []
+    for i, (host, _) in enumerate(hosts):
+        info = inventory.get(host) or {}
+        frontend_hosts.append({"id": host, "ip": ip_mapping[host],
+                               "label": info.get('label') or f"Switch IP Address {i+1}",
+                               "groups": info.get('groups', []), "tags": info.get('tags', []),
+                               "unreachable_since": host_health.unreachable_since(ip_mapping[host])
+                                                    or coordinator.unreachable_since(ip_mapping[host])})
+    return frontend_hosts
+
 @app.route('/')
 def index():
-    hosts, ip_mapping = get_available_hosts()
-    frontend_hosts = [{"id": host, "ip": ip_mapping[host], "label": f"Switch IP Address {i+1}"} for i, (host, _) in enumerate(hosts)]
-    return render_template('index3.html', hosts=frontend_hosts)
+    return render_template('index3.html', hosts=get_frontend_hosts())
 
 @app.route('/interface')
 def interface():
-    hosts, ip_mapping = get_available_hosts()
-    frontend_hosts = [{"id": host, "ip": ip_mapping[host], "label": f"Switch IP Address {i+1}"} for i, (host, _) in enumerate(hosts)]
-    return render_template('interface.html', hosts=frontend_hosts)
+    return render_template('interface.html', hosts=get_frontend_hosts())
+
+def collect_system_data(host_id, host_info, on_section=None):
+    """
+    Collect and parse system health for one switch.
+    """
+    started = time.time()
+    sections = system_metrics.process_host(host_info, on_section, polling_policy)
+    parsed_data = parse_switch_report(sections)
+    parsed_data["Switch IP Address"] = host_info['host']
+    parsed_data["timestamp"] = datetime.now().strftime("%A, %B %d, %Y %I:%M:%S %p")
+    parsed_data["collection_seconds"] = round(time.time() - started, 3)
+    transcript_archive.store(host_id, 'system', sections)
+    reason = system_change(parsed_data["cpu"])
+    if reason:
+        polling_policy.boost(host_info['host'], reason)
+    return parsed_data
+
+def collect_interface_data(host_id, host_info, on_section=None):
+    """
+    Collect and parse interface and port health for one switch.
+    """
+    started = time.time()
+    previous = snapshot_cache.get(host_id, 'interface', max_age=float('inf'))
+    reused = set()
+    sections = interface_metrics.process_host(host_info, on_section, polling_policy, reused)
+    if not sections:
+        raise ValueError("Interface collection returned no data")
+    file_contents = interface_metrics.format_interface_report(sections)
+
+    interface_data = {
+        "interface_result": file_contents,  # Keep raw data for static template
+        "switch_ip": host_info['host'],
+        "timestamp": datetime.now().strftime("%A, %B %d, %Y %I:%M:%S %p")
+    }
+    # Optional: Add parsed data if you plan to use it later
+    interface_data.update(parse_interface_report(sections, reused))
+    interface_data["rates"] = rate_engine.update(host_id, sampled_ports(interface_data))
+    interface_data["flaps"] = flap_tracker.flaps(host_info['host'])
+    interface_data["collection_seconds"] = round(time.time() - started, 3)
+    transcript_archive.store(host_id, 'interface', sections)
+    # Link state changes, error rates over threshold and new flaps speed up polling
+    reason = interface_change(previous['data'].get('ports') if previous else None, interface_data["ports"],
+                              interface_data["rates"], interface_data["flaps"],
+                              since=previous['collected_at'] if previous else None)
+    if reason:
+        polling_policy.boost(host_info['host'], reason)
+    return interface_data
+
+def record_snapshot(host_id, kind, data, collected_at=None):
+    """
+    Store a parsed collection in the snapshot cache, history and port index,
+    whether collected here or pushed by a cluster worker.
+    """
+    collected_at = snapshot_cache.put(host_id, kind, data, collected_at)
+    if kind == 'system':
+        history_store.record_system(host_id, cpu=data.get("cpu"), power=data.get("power"), timestamp=collected_at)
+        port_index.set_voice_vlan(host_id, data.get("voice_vlan"))
+    else:
+        history_store.record_ports(host_id, sampled_ports(data), timestamp=collected_at)
+        # Reused counters equal what the last fresh collection indexed
+        port_index.update_switch(host_id, data.get("ports") or [], collected_at)
+    return collected_at
+
+def sampled_ports(data):
+    """
+    An interface snapshot's ports with the counters that repeat reused
+    'show interfaces' output blanked, so rates and history skip them
+    instead of recording a stale value as a new sample.
+    """
+    ports = data.get("ports") or []
+    stale = data.get("reused_counters")
+    if not stale:
+        return ports
+    return [{**port, **dict.fromkeys(stale)} for port in ports]
+
+# Per-port error/drop/traffic rates across polls
+rate_engine = RateEngine()
+
+# Fleet-wide port lookup by state, speed/duplex, VLAN and errors
+port_index = PortIndex()
+
+# Minute-resolution CPU, PoE and port counter history for charts
+history_store = HistoryStore(HISTORY_DB_PATH)
+
+# Compressed command output of every collection, indexed by switch and time
+transcript_archive = TranscriptArchive(ARCHIVE_PATH)
+
+# Collector workers (python cluster.py worker http://<this app>:5000) and their
+# shards of the inventory; while none is alive the scheduler below collects everything
+coordinator = Coordinator(lambda: read_fleet_inventory(INVENTORY_PATH))
+
+# Latest snapshot per switch, refreshed in the background by the scheduler
+snapshot_cache = SnapshotCache(interval_fn=lambda host_id, kind: scheduler.interval_for(
+    system_metrics.read_inventory(host_id), kind))
+scheduler = CollectionScheduler(
+    {'system': collect_system_data, 'interface': collect_interface_data},
+    lambda: coordinator.local_hosts(read_fleet_inventory(INVENTORY_PATH)),
+    snapshot_cache,
+    interval_fn=lambda host_info, kind, interval: polling_policy.interval(host_info['host'], interval),
+    store_fn=record_snapshot,
+    housekeeping=[history_store.maybe_maintain, transcript_archive.maybe_maintain])
+
+# Prometheus text rendered from the snapshot cache
+metrics_exporter = PrometheusExporter(snapshot_cache)
+
+# Serialized, compressed /snapshot bodies shared by every viewer
+encoded_responses = EncodedResponses()
+
+# Response types worth compressing; event streams are never buffered
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain')
+
+STREAM_KEEPALIVE = 15           # Seconds between keepalive comments on a quiet event stream
+STREAM_DEADLINE = HOST_TIMEOUT  # Seconds a streamed collection may take, the fleet sweep's per-switch limit
+
+@app.after_request
+def encode_response(response):
+    """
+    Let GET requests for unchanged JSON answer 304 (content-hash ETag) and
+    gzip/brotli-compress JSON, HTML and text bodies for clients that accept it.
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    if request.method == 'GET' and response.mimetype == 'application/json' and not response.get_etag()[0]:
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    body = response.get_data()
+    if encoding and len(body) >= MIN_COMPRESS_BYTES:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def worker_snapshot(host_id, kind):
+    """
+    Latest snapshot, however old, of a switch a cluster worker owns, or
+    None if the app collects the switch itself. Never connects: a second
+    session to a worker's switch would defeat the sharding, so with no
+    snapshot pushed yet WorkerOwnedError is raised instead.
+    """
+    worker_id = coordinator.owner(host_id)
+    if worker_id is None:
+        return None
+    cached = snapshot_cache.get(host_id, kind, max_age=float('inf'))
+    if cached is None:
+        raise WorkerOwnedError(host_id, worker_id)
+    return cached
+
+def get_snapshot(selected_host, kind):
+    """
+    Serve the cached snapshot for a switch, collecting it now if it is
+    missing, stale or the request asks for ?force=1. Switches owned by a
+    cluster worker are only ever served from the cache.
+    """
+    cached = worker_snapshot(selected_host, kind)
+    if cached is None and request.values.get('force') != '1':
+        cached = snapshot_cache.get(selected_host, kind)
+    if cached:
+        data = dict(cached['data'])
+        data["cache"] = {"source": "cache", "age": cached['age'], "collected_at": cached['collected_at'],
+                         "version": cached['version']}
+        return data
+    host_info = system_metrics.read_inventory(selected_host)
+    data = dict(scheduler.collect_now(selected_host, kind, host_info))
+    data["cache"] = {"source": "live", "age": 0, "version": snapshot_version(selected_host, kind)}
+    return data
+
+def collection_failed(label, e):
+    """
+    Error response for a failed collection: 503 with Retry-After while the
+    circuit breaker skips the switch or its cluster worker has not pushed
+    it yet, 500 otherwise.
+    """
+    response = jsonify({"error": f"{label} collection failed: {e}",
+                        "unreachable_since": getattr(e, 'unreachable_since', None)})
+    if isinstance(e, (HostUnreachableError, WorkerOwnedError)):
+        response.headers['Retry-After'] = str(max(math.ceil(e.retry_in), 1))
+        return response, 503
+    return response, 500
+
+def snapshot_version(host_id, kind):
+    cached = snapshot_cache.get(host_id, kind, max_age=float('inf'))
+    return cached['version'] if cached else None
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/stream')
+def stream():
+    """
+    Server-Sent Events feed of one switch's system and interface data.
+
+    Both collectors run at the same time on their own pooled sessions and
+    every section is sent as a 'section' event as soon as its command
+    returns, followed by the parsed 'snapshot' of each kind and a final
+    'done'. Fresh cached snapshots are sent straight away unless ?force=1;
+    switches owned by a cluster worker always get their cached snapshot.
+    A quiet stream gets a keepalive comment every STREAM_KEEPALIVE seconds,
+    and kinds still pending after STREAM_DEADLINE get a timeout 'error'.
+    """
+    selected_host = request.args.get('selected_host')
+    if not selected_host:
+        return jsonify({"error": "No switch selected."}), 400
+    force = request.args.get('force') == '1'
+    events = queue.Queue()
+
+    def collect(kind, host_info):
+        def on_section(title, output):
+            events.put(('section', {"kind": kind, "title": title, "output": output}))
+        try:
+            data = dict(scheduler.collect_now(selected_host, kind, host_info, on_section=on_section))
+            data["cache"] = {"source": "live", "age": 0, "version": snapshot_version(selected_host, kind)}
+            events.put(('snapshot', {"kind": kind, "data": data}))
+        except Exception as e:
+            logger.error(f"Streaming {kind} collection failed for {selected_host}: {e}")
+            events.put(('error', {"kind": kind, "error": str(e),
+                                  "unreachable_since": getattr(e, 'unreachable_since', None)}))
+
+    pending = 0
+    host_info = None
+    for kind in ('system', 'interface'):
+        try:
+            cached = worker_snapshot(selected_host, kind)
+        except WorkerOwnedError as e:
+            events.put(('error', {"kind": kind, "error": str(e), "retry_in": e.retry_in}))
+            continue
+        if cached is None and not force:
+            cached = snapshot_cache.get(selected_host, kind)
+        if cached:
+            data = dict(cached['data'])
+            data["cache"] = {"source": "cache", "age": cached['age'], "collected_at": cached['collected_at'],
+                             "version": cached['version']}
+            events.put(('snapshot', {"kind": kind, "data": data}))
+            continue
+        try:
+            host_info = host_info or system_metrics.read_inventory(selected_host)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 404
+        threading.Thread(target=collect, args=(kind, host_info), name=f"stream-{kind}", daemon=True).start()
+        pending += 1
+
+    logger.info(f"Streaming data for host: {selected_host} ({pending} live collections)")
+
+    def generate():
+        remaining = {'system', 'interface'}
+        deadline = time.time() + STREAM_DEADLINE
+        while remaining:
+            try:
+                event, payload = events.get(timeout=min(STREAM_KEEPALIVE, max(deadline - time.time(), 0)))
+            except queue.Empty:
+                if time.time() < deadline:
+                    # Writing it also ends the stream once the client has gone away
+                    yield ": keepalive\n\n"
+                    continue
+                for kind in sorted(remaining):
+                    logger.error(f"Streaming {kind} collection for {selected_host} timed out after {STREAM_DEADLINE}s")
+                    yield sse_event('error', {"kind": kind, "error": f"No result within {STREAM_DEADLINE}s"})
+                break
+            if event in ('snapshot', 'error'):
+                remaining.discard(payload['kind'])
+            yield sse_event(event, payload)
+        yield sse_event('done', {"host": selected_host})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/snapshot', methods=['GET'])
+def get_snapshot_json():
+    """
+    Cached snapshot of one switch for dashboard refreshes
+    (?selected_host=host1&kind=system|interface), collected now only if
+    missing or stale.
+
+    The body is {"version", "cache", "data"} with a content-hash ETag, so
+    If-None-Match answers 304. With &since=<version> the page already
+    holds, an unchanged snapshot answers 304 and a newer one is sent as
+    {"version", "base", "cache", "patch"} with only the sections and ports
+    that changed (see delta_encoding.compute_delta); a version no longer
+    kept falls back to the full body. The Age header gives the snapshot age;
+    switches owned by a cluster worker are served however old their
+    snapshot is.
+    """
+    selected_host = request.args.get('selected_host')
+    kind = request.args.get('kind', 'system')
+    if not selected_host or kind not in ('system', 'interface'):
+        return jsonify({"error": "selected_host and kind=system|interface are required"}), 400
+    try:
+        cached = worker_snapshot(selected_host, kind) or snapshot_cache.get(selected_host, kind)
+        if cached is None:
+            scheduler.collect_now(selected_host, kind, system_metrics.read_inventory(selected_host))
+            cached = snapshot_cache.get(selected_host, kind, max_age=float('inf'))
+    except ConnectionError as e:
+        logger.error(f"Snapshot collection failed for {selected_host}: {e}")
+        return collection_failed(kind.capitalize(), e)
+    except Exception as e:
+        logger.exception(f"Exception in get_snapshot_json: {str(e)}")
+        return jsonify({"error": str(e), "details": "See server logs"}), 500
+
+    version = cached['version']
+    headers = {'Age': str(int(cached['age'])), 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    since = request.args.get('since', type=int)
+    if since == version:
+        return Response(status=304, headers=headers)
+    base = snapshot_cache.version(selected_host, kind, since) if since else None
+    meta = {"source": "cache", "collected_at": cached['collected_at'], "version": version}
+
+    def build():
+        if base is None:
+            return {"version": version, "cache": meta, "data": cached['data']}
+        return {"version": version, "base": since, "cache": meta, "patch": compute_delta(base, cached['data'])}
+
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    etag, body, used = encoded_responses.get((selected_host, kind, since if base is not None else None, version),
+                                             build, encoding)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+    else:
+        response = Response(body, content_type='application/json', headers=headers)
+        if used:
+            response.headers['Content-Encoding'] = used
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/run-script', methods=['POST'])
 def run_system_script():
@@ -63,36 +413,14 @@ def run_system_script():
         if not selected_host or not selected_ip:
             return jsonify({"error": "No switch selected."}), 400
 
-        logger.info(f"Running system script for host: {selected_host}, IP: {selected_ip}")
-        process = subprocess.run(['python', SYSTEM_SCRIPT_PATH, selected_host], capture_output=True, text=True)
-        if process.returncode != 0:
-            logger.error(f"System script failed: {process.stderr}")
-            return jsonify({"error": f"System script execution failed: {process.stderr}"}), 500
-
-        timeout = 30
-        start_time = time.time()
-        date_str = time.strftime("%Y%m%d")
-        file_pattern = os.path.join(LOG_DIR, f"basicinfo_{date_str}_*.txt")
-
-        latest_file = None
-        while time.time() - start_time < timeout:
-            files = glob.glob(file_pattern)
-            if files:
-                latest_file = max(files, key=os.path.getctime)
-                break
-            time.sleep(1)
-
-        if not latest_file:
-            logger.error("Timeout: No matching basicinfo file found.")
-            return jsonify({"error": "Timeout: No matching basicinfo file found."}), 500
-
-        with open(latest_file, 'r') as file:
-            data = file.read()
-            parsed_data = parse_switch_report(data)
-            parsed_data["Switch IP Address"] = selected_ip
-            parsed_data["timestamp"] = datetime.now().strftime("%A, %B %d, %Y %I:%M:%S %p")
+        logger.info(f"System data requested for host: {selected_host}, IP: {selected_ip}")
+        try:
+            parsed_data = get_snapshot(selected_host, 'system')
+        except ConnectionError as e:
+            logger.error(f"System collection failed: {e}")
+            return collection_failed("System", e)
 
-        logger.info("System data retrieved")
+        logger.info(f"System data retrieved ({parsed_data['cache']['source']})")
         return jsonify(parsed_data)
 
     except Exception as e:
@@ -108,56 +436,291 @@ def run_interface_script():
             logger.warning("No switch selected in run_interface_script")
             return jsonify({"error": "No switch selected."}), 400
 
-        logger.info(f"Running interface script for host: {selected_host}, IP: {selected_ip}")
-        process = subprocess.run(['python', INTERFACE_SCRIPT_PATH, selected_host], capture_output=True, text=True)
-        if process.returncode != 0:
-            logger.error(f"Interface script failed: {process.stderr}")
-            return jsonify({"error": f"Interface script execution failed: {process.stderr}"}), 500
-
-        timeout = 30
-        start_time = time.time()
-        date_str = time.strftime("%Y%m%d")
-        file_pattern = os.path.join(LOG_DIR, f"interface_port_{date_str}_*.txt")
-
-        latest_file = None
-        while time.time() - start_time < timeout:
-            files = glob.glob(file_pattern)
-            if files:
-                latest_file = max(files, key=os.path.getctime)
-                logger.debug(f"Found interface file: {latest_file}")
-                break
-            time.sleep(1)
-
-        if not latest_file:
-            logger.error("Timeout: No matching interface_port file found.")
-            return jsonify({"error": "Timeout: No matching interface_port file found."}), 500
-
+        logger.info(f"Interface data requested for host: {selected_host}, IP: {selected_ip}")
         try:
-            with open(latest_file, 'r') as file:
-                file_contents = file.read()
-            logger.info(f"Interface file contents (first 500 chars): {file_contents[:500]}")
-            if not file_contents.strip():
-                logger.warning("Interface file is empty")
-                return jsonify({"error": "Interface file is empty"}), 500
-        except IOError as e:
-            logger.error(f"Failed to read interface file {latest_file}: {str(e)}")
-            return jsonify({"error": f"Failed to read interface data: {str(e)}"}), 500
-
-        interface_data = {
-            "interface_result": file_contents,  # Keep raw data for static template
-            "switch_ip": selected_ip,
-            "timestamp": datetime.now().strftime("%A, %B %d, %Y %I:%M:%S %p")
-        }
-        # Optional: Add parsed data if you plan to use it later
-        interface_data.update(parse_interface_report(file_contents))
-
-        logger.info("Interface data retrieved successfully")
+            interface_data = get_snapshot(selected_host, 'interface')
+        except ConnectionError as e:
+            logger.error(f"Interface collection failed: {e}")
+            return collection_failed("Interface", e)
+
+        logger.info(f"Interface data retrieved successfully ({interface_data['cache']['source']})")
         return jsonify(interface_data)
 
     except Exception as e:
         logger.exception(f"Exception in run_interface_script: {str(e)}")
         return jsonify({"error": str(e), "details": "See server logs"}), 500
     
+@app.route('/fleet', methods=['GET', 'POST'])
+def run_fleet():
+    """
+    Poll every switch in the inventory concurrently and return one report.
+    """
+    try:
+        collector = request.values.get('collector', 'system')
+        if collector not in ('system', 'interface'):
+            return jsonify({"error": f"Unknown collector '{collector}'"}), 400
+        max_workers = request.values.get('concurrency', MAX_WORKERS, type=int)
+        host_timeout = request.values.get('timeout', HOST_TIMEOUT, type=float)
+
+        hosts = read_fleet_inventory(INVENTORY_PATH, group=request.values.get('group'), tag=request.values.get('tag'))
+        logger.info(f"Running {collector} fleet sweep over {len(hosts)} hosts (concurrency {max_workers})")
+        if collector == 'system':
+            report = poll_fleet(system_metrics.process_host, hosts, max_workers, host_timeout)
+        else:
+            report = poll_fleet(interface_metrics.process_host, hosts, max_workers, host_timeout)
+
+        for result in report['hosts'].values():
+            if result['status'] != 'ok':
+                continue
+            sections = result.pop('sections')
+            if collector == 'system':
+                result['data'] = parse_switch_report(sections)
+            else:
+                result['data'] = parse_interface_report(sections)
+
+        if collector == 'interface':
+            # One batched delta pass over every port of the sweep
+            samples = [(host_id, result['data']['ports'], None)
+                       for host_id, result in report['hosts'].items() if result['status'] == 'ok']
+            for host_id, rates in rate_engine.update_many(samples).items():
+                report['hosts'][host_id]['data']['rates'] = rates
+            for host_id, ports, _ in samples:
+                port_index.update_switch(host_id, ports)
+        else:
+            for host_id, result in report['hosts'].items():
+                if result['status'] == 'ok':
+                    port_index.set_voice_vlan(host_id, result['data']['voice_vlan'])
+        report['collector'] = collector
+        report['timestamp'] = datetime.now().strftime("%A, %B %d, %Y %I:%M:%S %p")
+        return jsonify(report)
+
+    except Exception as e:
+        logger.exception(f"Exception in run_fleet: {str(e)}")
+        return jsonify({"error": str(e), "details": "See server logs"}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus scrape endpoint: latest CPU, PoE, port link state and
+    counters and collection latency from the snapshot cache. Never
+    connects to a switch.
+    """
+    return Response(metrics_exporter.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/instrumentation', methods=['GET', 'DELETE'])
+def get_instrumentation():
+    """
+    Collector latency histograms per stage (connect, prompt, enable, paging,
+    command, parse, and merge for combining the parsed outputs, which
+    includes their parse spans), per command/parser and per host.
+    ?recent=N adds the last N individual spans; DELETE resets the counters.
+    """
+    if request.method == 'DELETE':
+        instrumentation.reset()
+        return jsonify({"status": "reset"})
+    summary = instrumentation.summary()
+    recent = request.args.get('recent', 0, type=int)
+    if recent > 0:
+        summary["recent"] = instrumentation.recent(recent)
+    return jsonify(summary)
+
+@app.route('/ports', methods=['GET'])
+def query_ports():
+    """
+    Find ports across the fleet from the in-memory port index, e.g.
+    ?error_bucket=10-99,100-999,1000+&sort=crc_errors, ?duplex=half,
+    ?vlan=100, ?link_state=down&switch=host1. Filters on switch,
+    link_state, speed, duplex, vlan, voice_vlan and error_bucket take
+    comma-separated values; min_<counter> (crc_errors, input_errors,
+    output_errors, drops, errors) sets a lower bound. sort names a field,
+    order=asc|desc (default desc) and limit (default 100, 0 for all).
+    Never connects to a switch.
+    """
+    started = time.perf_counter()
+    filters = {field: request.args[field].split(',') for field in INDEXED_FIELDS if request.args.get(field)}
+    try:
+        minimums = {field: int(request.args[f'min_{field}']) for field in NUMERIC_FIELDS
+                    if request.args.get(f'min_{field}')}
+    except ValueError:
+        return jsonify({"error": "min_ filters must be integers"}), 400
+    sort = request.args.get('sort')
+    if sort and sort not in INDEXED_FIELDS + NUMERIC_FIELDS + ('port',):
+        return jsonify({"error": f"Cannot sort by '{sort}'"}), 400
+    total, ports = port_index.query(filters, minimums, sort=sort,
+                                    descending=request.args.get('order', 'desc') != 'asc',
+                                    limit=request.args.get('limit', 100, type=int))
+    result = {"total": total, "count": len(ports), "indexed": len(port_index), "ports": ports,
+              "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}
+    if request.args.get('facets') == '1':
+        result["facets"] = port_index.facets()
+    return jsonify(result)
+
+@app.route('/transcripts', methods=['GET'])
+def get_transcripts():
+    """
+    Archived command output for one switch (?selected_host=host1).
+    Without a range, returns the latest run of &kind=system|interface.
+    With &start and/or &end (epoch seconds) lists runs in that window,
+    newest first, optionally filtered by &section=title; &text=1 includes
+    the output. &limit caps the runs listed (default 100).
+    """
+    selected_host = request.args.get('selected_host')
+    if not selected_host:
+        return jsonify({"error": "No switch selected."}), 400
+    kind = request.args.get('kind')
+    if 'start' not in request.args and 'end' not in request.args:
+        run = transcript_archive.latest(selected_host, kind or 'system')
+        if run is None:
+            return jsonify({"error": f"No archived {kind or 'system'} transcript for {selected_host}"}), 404
+        return jsonify(run)
+    runs = transcript_archive.runs(selected_host, kind, section=request.args.get('section'),
+                                   start=request.args.get('start', type=float),
+                                   end=request.args.get('end', type=float),
+                                   limit=request.args.get('limit', 100, type=int))
+    if request.args.get('text') == '1':
+        for run in runs:
+            run['data'] = transcript_archive.read(run)
+    return jsonify({"host": selected_host, "count": len(runs), "runs": runs})
+
+@app.route('/reachability', methods=['GET', 'DELETE'])
+def get_reachability():
+    """
+    Circuit breaker state per switch address: failures in a row, since
+    when it is unreachable and when it will next be probed. DELETE (with
+    optional ?host=ip) clears it so the switch is contacted again at once.
+    """
+    if request.method == 'DELETE':
+        host_health.reset(request.args.get('host'))
+        return jsonify({"status": "reset"})
+    return jsonify(host_health.status())
+
+def cluster_payload():
+    """
+    Check the shared cluster token and decode a worker request (gzip JSON
+    from cluster.post_json). Returns (payload, None) or (None, error response).
+    """
+    if not CLUSTER_TOKEN:
+        return None, (jsonify({"error": "Cluster mode is disabled; set SWITCH_MONITOR_CLUSTER_TOKEN"}), 403)
+    if not hmac.compare_digest(request.headers.get(TOKEN_HEADER, ''), CLUSTER_TOKEN):
+        return None, (jsonify({"error": "Invalid cluster token"}), 403)
+    try:
+        body = request.get_data()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        payload = json.loads(body)
+    except (OSError, EOFError, ValueError) as e:
+        return None, (jsonify({"error": f"Malformed request body: {e}"}), 400)
+    if not isinstance(payload, dict) or not isinstance(payload.get('worker'), str) or not payload['worker']:
+        return None, (jsonify({"error": "A JSON object with a 'worker' id is required"}), 400)
+    return payload, None
+
+def valid_result(result):
+    if not (isinstance(result, dict) and result.get('kind') in ('system', 'interface')
+            and isinstance(result.get('host_id'), str) and isinstance(result.get('data'), dict)
+            and isinstance(result.get('collected_at'), (int, float, type(None)))):
+        return False
+    rates = result['data'].get('rates')
+    return rates is None or (isinstance(rates, dict) and isinstance(rates.get('ports'), dict)
+                             and all(isinstance(entry, dict) and isinstance(entry.get('flags'), list)
+                                     for entry in rates['ports'].values()))
+
+@app.route('/cluster/heartbeat', methods=['POST'])
+def cluster_heartbeat():
+    """
+    Worker heartbeat; answers with the host ids the worker owns.
+    """
+    payload, error = cluster_payload()
+    if error:
+        return error
+    unreachable = payload.get('unreachable')
+    hosts = coordinator.heartbeat(payload['worker'], address=payload.get('address') or request.remote_addr,
+                                  unreachable=unreachable if isinstance(unreachable, dict) else None)
+    return jsonify({"hosts": hosts})
+
+@app.route('/cluster/results', methods=['POST'])
+def cluster_results():
+    """
+    Parsed collections pushed by a worker, stored as if collected here.
+    """
+    payload, error = cluster_payload()
+    if error:
+        return error
+    results = payload.get('results')
+    if not isinstance(results, list) or not all(valid_result(result) for result in results):
+        return jsonify({"error": "'results' must be a list of {host_id, kind: system|interface, "
+                                 "collected_at, data}"}), 400
+    if not coordinator.record_results(payload['worker'], len(results)):
+        return jsonify({"error": f"Unknown worker {payload['worker']}, send a heartbeat first"}), 409
+    for result in results:
+        data = result['data']
+        if result['kind'] == 'interface':
+            # The worker's flaps come from polled 'show log'; add live syslog flaps seen here
+            syslog_flaps = flap_tracker.flaps(data.get("switch_ip"))
+            if syslog_flaps:
+                data["flaps"] = {**(data.get("flaps") or {}), **syslog_flaps}
+            # Rates were computed by the worker, which holds the previous samples
+            if data.get("rates") is not None:
+                rate_engine.set_latest(result['host_id'], data["rates"])
+        record_snapshot(result['host_id'], result['kind'], data, result.get('collected_at'))
+    return jsonify({"accepted": len(results)})
+
+@app.route('/cluster', methods=['GET'])
+def get_cluster():
+    """
+    Live collector workers with their shards, last heartbeat and the
+    switches their circuit breakers skip.
+    """
+    return jsonify(coordinator.status())
+
+@app.route('/polling', methods=['GET'])
+def get_polling():
+    """
+    Adaptive polling state per switch: boost reason and expiry, last
+    change and which command outputs are currently served from cache.
+    """
+    return jsonify(polling_policy.status())
+
+@app.route('/rates', methods=['GET'])
+def get_rates():
+    """
+    Latest per-port rates for one switch (?selected_host=host1), or every
+    port currently over a threshold across the fleet.
+    """
+    selected_host = request.args.get('selected_host')
+    if selected_host:
+        rates = rate_engine.latest(selected_host)
+        if rates is None:
+            return jsonify({"error": f"No rates collected yet for {selected_host}"}), 404
+        return jsonify(rates)
+    flagged = [{"switch": switch, "port": port, **entry} for switch, port, entry in rate_engine.flagged()]
+    return jsonify({"thresholds": rate_engine.thresholds, "flagged": flagged})
+
+@app.route('/history', methods=['GET'])
+def get_history():
+    """
+    Time series for charts: ?selected_host=host1&metric=cpu_5s, or a port
+    metric with &port=gi1/0/1. Optional start/end (epoch seconds, default
+    last 24h) and step (seconds per point).
+    """
+    try:
+        selected_host = request.args.get('selected_host')
+        metric = request.args.get('metric', 'cpu_5s')
+        port = request.args.get('port')
+        end = request.args.get('end', time.time(), type=float)
+        start = request.args.get('start', end - 86400, type=float)
+        step = request.args.get('step', type=int)
+        if not selected_host:
+            return jsonify({"error": "No switch selected."}), 400
+
+        if port:
+            points = history_store.query_port(selected_host, port, metric, start, end, step)
+        else:
+            points = history_store.query_system(selected_host, metric, start, end, step)
+        return jsonify({"switch": selected_host, "port": port, "metric": metric,
+                        "points": [[ts, value] for ts, value in points]})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route('/reset', methods=['POST'])
 def reset_data():
     logger.info("Reset requested")
@@ -166,16 +729,15 @@ def reset_data():
 @app.route('/clear-logs', methods=['POST'])
 def clear_logs():
     try:
-        log_file = os.path.join(LOG_DIR, "Switch_monitoring.log")
-        if os.path.exists(log_file):
-            open(log_file, 'w').close()
-        logger.info("Switch_monitoring.log cleared")
+        # Roll over instead of truncating so concurrent writers never lose records
+        rollover_logs()
+        logger.info("Switch_monitoring.log rolled over")
         return jsonify({"status": "logs cleared"})
     except Exception as e:
         logger.error(f"Failed to clear Switch_monitoring.log: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def parse_switch_report(data):
+def parse_switch_report(sections_data):
     sections = [
         "System Information",
         "Version Information",
@@ -186,14 +748,13 @@ def parse_switch_report(data):
     ]
     parsed_data = {}
     for section in sections:
-        match = re.search(fr'=== {section} ===(.*?)(?:\n===|$)', data, re.DOTALL)
-        if match:
-            parsed_data[section] = match.group(1).strip()
-        else:
-            parsed_data[section] = "No data found"
+        parsed_data[section] = sections_data.get(section, "").strip() or "No data found"
+    parsed_data["cpu"] = parse_cpu_utilization(sections_data.get("CPU Utilization", ""))
+    parsed_data["power"] = parse_power_inline(sections_data.get("Power Supply Status", ""))
+    parsed_data["voice_vlan"] = parse_voice_vlan(sections_data.get("Voice VLAN Information", ""))
     return parsed_data
 
-def parse_interface_report(data):
+def parse_interface_report(sections_data, reused=()):
     sections = [
         "Port Status",
         "Speed & Duplex",
@@ -203,12 +764,31 @@ def parse_interface_report(data):
     ]
     parsed_data = {}
     for section in sections:
-        match = re.search(fr'=== {section} ===(.*?)(?:\n===|$)', data, re.DOTALL)
-        if match:
-            parsed_data[section] = match.group(1).strip()
-        else:
-            parsed_data[section] = "No data found"
+        parsed_data[section] = sections_data.get(section, "").strip() or "No data found"
+
+    # Typed per-port records (link state, speed/duplex, CRC, errors, drops)
+    fresh = dict(
+        status_text=sections_data.get("Port Status", ""),
+        counters_texts=[output for title, output in sections_data.items()
+                        if title.startswith(interface_metrics.COUNTER_SECTIONS)],
+        queue_text=sections_data.get("Output Drops", ""))
+    records = build_port_records(interfaces_text=sections_data.get("Port Flapping (Interfaces)", ""), **fresh)
+    parsed_data["ports"] = ports_to_json(records)
+    if "Port Flapping (Interfaces)" in reused:
+        # Counters that only the cached 'show interfaces' output reports did not move this poll
+        fresh_ports = ports_to_json(build_port_records(**fresh))
+        parsed_data["reused_counters"] = sorted(
+            field for _, fields in INTERFACE_COUNTERS for field in fields
+            if any(port.get(field) is not None for port in parsed_data["ports"])
+            and all(port.get(field) is None for port in fresh_ports))
     return parsed_data
 
 if __name__ == '__main__':
+    # With the debug reloader only the child process runs the scheduler
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        scheduler.start()
+        try:
+            SyslogListener(flap_tracker).start()
+        except OSError as e:
+            logger.warning(f"Syslog listener not started: {e}")
     app.run(debug=True, host='0.0.0.0')
\ No newline at end of file
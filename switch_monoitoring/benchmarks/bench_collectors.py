@@ -0,0 +1,140 @@
+"""
+End-to-end collector benchmark against the local fake switch server.
+
+Measures per-switch collection time (cold connect and pooled session) and
+fleet sweep time, throughput and peak Python memory for the system and
+interface collectors. Devices are simulated on loopback addresses
+127.0.x.y, which Linux routes to the local host without extra setup.
+
+Run from the switch_monoitoring directory:
+    python benchmarks/bench_collectors.py [--devices 50] [--latency 0.05]
+
+For CI, save a baseline once and compare later runs against it; the run
+exits with status 1 if any timing is slower than the tolerance allows:
+    python benchmarks/bench_collectors.py --json baseline.json
+    python benchmarks/bench_collectors.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import System_healthMetrics as system_metrics  # noqa: E402
+import Interface_Porthealth_Metrics as interface_metrics  # noqa: E402
+from fleet import poll_fleet  # noqa: E402
+from session_pool import session_pool  # noqa: E402
+from fake_switch import FakeSwitchServer  # noqa: E402
+
+COLLECTORS = {
+    'system': system_metrics.process_host,
+    'interface': interface_metrics.process_host,
+}
+
+
+def make_hosts(devices, port):
+    """
+    host_info for each simulated device, one loopback address per device.
+    """
+    hosts = {}
+    for index in range(devices):
+        address = f"127.0.{index // 250}.{index % 250 + 1}"
+        hosts[f"bench{index + 1}"] = {'id': f"bench{index + 1}", 'host': address, 'username': 'admin',
+                                      'password': 'bench', 'port': port}
+    return hosts
+
+def time_switch(process_host, host_info, repeat):
+    """
+    (cold seconds, best pooled seconds) for one switch.
+    """
+    session_pool.close_all()
+    started = time.perf_counter()
+    process_host(host_info)
+    cold = time.perf_counter() - started
+    warm = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process_host(host_info)
+        warm.append(time.perf_counter() - started)
+    return cold, min(warm)
+
+def time_fleet(process_host, hosts, concurrency):
+    report = poll_fleet(process_host, hosts, max_workers=concurrency)
+    return report['elapsed'], report['summary']
+
+def run_benchmarks(args):
+    server = FakeSwitchServer(latency=args.latency, ports=args.ports, transcripts_dir=args.transcripts)
+    port = server.start()
+    hosts = make_hosts(args.devices, port)
+    first = next(iter(hosts.values()))
+    results = {'devices': args.devices, 'latency': args.latency, 'concurrency': args.concurrency}
+    try:
+        for name, process_host in COLLECTORS.items():
+            cold, warm = time_switch(process_host, first, args.repeat)
+            results[f'{name}_switch_cold_seconds'] = round(cold, 4)
+            results[f'{name}_switch_pooled_seconds'] = round(warm, 4)
+
+            session_pool.close_all()
+            elapsed, summary = time_fleet(process_host, hosts, args.concurrency)
+            results[f'{name}_fleet_cold_seconds'] = round(elapsed, 4)
+            results[f'{name}_fleet_failed'] = summary['error'] + summary['timeout']
+            elapsed, summary = time_fleet(process_host, hosts, args.concurrency)
+            results[f'{name}_fleet_pooled_seconds'] = round(elapsed, 4)
+            results[f'{name}_fleet_switches_per_second'] = round(len(hosts) / elapsed, 2) if elapsed else None
+
+            tracemalloc.start()
+            time_fleet(process_host, hosts, args.concurrency)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[f'{name}_fleet_peak_memory_mb'] = round(peak / (1024 * 1024), 2)
+    finally:
+        session_pool.close_all()
+        server.stop()
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Names of timings more than tolerance slower than the baseline.
+    """
+    regressions = []
+    for key, value in results.items():
+        if not key.endswith('_seconds') or not isinstance(baseline.get(key), (int, float)):
+            continue
+        if value > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {value:.3f}s vs baseline {baseline[key]:.3f}s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector benchmark against a local fake switch")
+    parser.add_argument('--devices', type=int, default=50, help="simulated switches in the fleet sweep")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds before each command answers")
+    parser.add_argument('--ports', type=int, default=None, help="ports per switch (default: 8-52 by address)")
+    parser.add_argument('--concurrency', type=int, default=16, help="switches polled at the same time")
+    parser.add_argument('--repeat', type=int, default=3, help="pooled runs per single-switch timing")
+    parser.add_argument('--transcripts', default=None, help="directory of recorded command outputs")
+    parser.add_argument('--json', default=None, help="write results to this file")
+    parser.add_argument('--baseline', default=None, help="fail if slower than this results file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown vs baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    print(f"Collector benchmark: {args.devices} devices, {args.latency}s latency, concurrency {args.concurrency}")
+    for key, value in results.items():
+        print(f"  {key:<40} {value}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Parser micro-benchmark on synthetic output for a 48-port switch.
+
+Run from the switch_monoitoring directory:
+    python benchmarks/bench_parsers.py [ports] [repeat]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parsers import (build_port_records, parse_cpu_utilization, parse_interface_counters,  # noqa: E402
+                     parse_interface_status, parse_interfaces, parse_queue_statistics)
+from fake_switch import generate_transcripts  # noqa: E402
+
+def make_outputs(ports=48):
+    """
+    The fake switch's synthetic output (Cisco Small Business format) for each parser.
+    """
+    outputs = {command: "\n".join(lines) for command, lines in generate_transcripts("bench", ports).items()}
+    return {
+        'status': outputs['show interfaces status'],
+        'counters': outputs['show interfaces counters'],
+        'interfaces': outputs['show interfaces'],
+        'queue': outputs['show queue statistics'],
+        'cpu': outputs['show cpu utilization'],
+    }
+
+def main():
+    ports = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    outputs = make_outputs(ports)
+    cases = [
+        ('show interface status', lambda: parse_interface_status(outputs['status'])),
+        ('show interfaces', lambda: parse_interfaces(outputs['interfaces'])),
+        ('show interfaces counters', lambda: parse_interface_counters(outputs['counters'])),
+        ('show queue statistics', lambda: parse_queue_statistics(outputs['queue'])),
+        ('show cpu utilization', lambda: parse_cpu_utilization(outputs['cpu'])),
+        ('all (merged records)', lambda: build_port_records(outputs['status'], outputs['interfaces'],
+                                                            [outputs['counters']], outputs['queue'])),
+    ]
+    print(f"Parser benchmark: {ports} ports, best of 5 x {repeat} runs")
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+        print(f"  {name:<28} {best * 1000:8.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Local SSH server impersonating Cisco Small Business switches, for benchmarks.
+
+Every shell gets a '<hostname>>' prompt, 'enable' with User Name/Password
+prompts, 24-line 'More:' paging until 'terminal datadump', and canned
+output for the commands the collectors send ('| include text' filters
+its lines). Each command answers after a configurable latency, scaled
+per command by SLOW_COMMANDS.
+
+One server can stand in for hundreds of devices: connect to different
+loopback addresses (127.0.0.1, 127.0.0.2, ...) on the same port and each
+address gets its own hostname and port count.
+
+Recorded transcripts can replace the generated output: put one file per
+command in a directory, named after the command with spaces replaced by
+underscores (show_version.txt), and pass it as transcripts_dir. '{hostname}'
+in a file is replaced by the device hostname.
+
+Run standalone:
+    python benchmarks/fake_switch.py [port] [latency]
+"""
+import os
+import socket
+import threading
+import time
+import paramiko
+
+PAGE_LINES = 24
+MORE = "More: <space>,  Quit: q or CTRL+Z, One line: <return> "
+LATENCY = 0.05          # Default seconds before a command answers
+MIN_PORTS = 8           # Port counts cycle through MIN_PORTS..MAX_PORTS per device address
+MAX_PORTS = 52
+
+# Relative response time of commands that are slow on real switches
+SLOW_COMMANDS = {"show interfaces": 4, "show log": 3, "show interfaces counters": 2}
+
+_host_key = None
+
+
+def device_for_address(address, ports=None):
+    """
+    (hostname, port count) for the loopback address a client connected to.
+    """
+    index = sum(int(part) for part in address.split('.')[1:]) if address.count('.') == 3 else 0
+    if ports is None:
+        ports = MIN_PORTS + (index * 4) % (MAX_PORTS - MIN_PORTS + 4)
+    return f"switch-{address.replace('.', '-')}", min(max(ports, MIN_PORTS), MAX_PORTS)
+
+def generate_transcripts(hostname, ports=48):
+    """
+    Command -> output lines for a switch with the given number of ports.
+    """
+    status = ["                                             Flow Link          Back   Mdix",
+              "Port     Type         Duplex  Speed Neg      ctrl State       Pressure Mode",
+              "-------- ------------ ------  ----- -------- ---- ----------- -------- -------"]
+    counters = ["", "    Port      InUcastPkts  InMcastPkts  InBcastPkts    InOctets",
+                "---------- ------------ ------------ ------------ ------------"]
+    out_counters = ["", "    Port      OutUcastPkts OutMcastPkts OutBcastPkts   OutOctets",
+                    "---------- ------------ ------------ ------------ ------------"]
+    interfaces = []
+    queue = ["Port       Queue  Tx packets   Dropped",
+             "---------- ------ ------------ ---------"]
+    for i in range(1, ports + 1):
+        up = i % 5 != 0
+        if up:
+            status.append(f"gi1/0/{i:<3} 1G-Copper    Full    1000  Enabled  Off  Up          Disabled On")
+        else:
+            status.append(f"gi1/0/{i:<3} 1G-Copper      --      --     --     --  Down           --     --")
+        counters.append(f"gi1/0/{i:<4} {1000 * i:>12} {10 * i:>12} {5 * i:>12} {123456 * i:>12}")
+        out_counters.append(f"gi1/0/{i:<4} {900 * i:>12} {9 * i:>12} {4 * i:>12} {654321 * i:>12}")
+        interfaces += [
+            f"GigabitEthernet1/0/{i} is {'up' if up else 'down'} ({'connected' if up else 'not connected'})",
+            f"  Hardware is Gigabit Ethernet, MAC address is 00:11:22:33:44:{i:02x}",
+            "  Full-duplex, 1000Mbps, link type is auto, media type is 1G-Copper" if up
+            else "  Auto-duplex, Auto-speed, media type is 1G-Copper",
+            f"  {1000 * i} packets input, {123456 * i} bytes, 0 throttles",
+            f"  {i % 3} input errors, {i % 3} CRC, 0 frame",
+            f"  {900 * i} packets output, {654321 * i} bytes, 0 underrun",
+            "  0 output errors, 0 collisions, 0 interface resets"]
+        for q in range(1, 5):
+            queue.append(f"gi1/0/{i:<4} {q:<6} {100 * i:>12} {i % 4:>9}")
+    log = []
+    for i in range(40):
+        state = "Down" if i % 2 == 0 else "Up"
+        log.append(f"{2147483647 - i:<10} 01-Jan-2024 10:{59 - i:02d}:00 "
+                   f":%LINK-{'W' if state == 'Down' else 'I'}-{state}:  gi1/0/{(i % 4) + 1}")
+    return {
+        "show version": ["Active-image: flash://system/images/image.bin",
+                         "  Version: 2.5.8.15", "  MD5 Digest: 0123456789abcdef",
+                         "  Date: 10-Jan-2022", "  Time: 10:00:00"],
+        "show system": ["System Description:                       48-Port Gigabit PoE Stackable Managed Switch",
+                        "System Up Time (days,hour:min:sec):        12,03:04:05",
+                        "System Contact:", f"System Name:                              {hostname}",
+                        "System Location:", "System MAC Address:                       00:11:22:33:44:55"],
+        "show cpu utilization": ["CPU utilization service is on.", "",
+                                 "CPU utilization", "--------------------------------------------------",
+                                 "five seconds: 7%; one minute: 5%; five minutes: 4%"],
+        "show power inline": ["Port limit Mode: Enabled", "Usage threshold: 95%", "Trap: Disabled",
+                              "Legacy Mode: Disabled", "",
+                              "Unit Module  Power (W)  Consumed Power (W) Usage threshold",
+                              "---- ------------ ------ ------------- --------",
+                              "1    SF350-48P  370  24.5(6%)   95"],
+        "show inventory": ["NAME: \"1\"   DESCR: \"48-Port Gigabit PoE Stackable Managed Switch\"",
+                           "PID: SG350-48P-K9  VID: V02  SN: ABC12345678"],
+        "show voice vlan": ["Administrate Voice VLAN state is auto-triggered on",
+                            "Operational Voice VLAN state is enabled", "Best Local Voice VLAN-ID is 100",
+                            "Best Local VPT is 5 (default)", "Best Local DSCP is 46 (default)",
+                            "Agreed Voice VLAN-ID is 100"],
+        "show interfaces status": status,
+        "show interface status": status,
+        "show interfaces counters": counters + out_counters,
+        "show interfaces": interfaces,
+        "show queue statistics": queue,
+        "show log": log,
+        "show logging": log,
+    }
+
+def load_transcripts(transcripts_dir):
+    """
+    Command -> raw text for every recorded transcript file in the directory.
+    """
+    recorded = {}
+    for name in os.listdir(transcripts_dir):
+        if name.endswith('.txt'):
+            with open(os.path.join(transcripts_dir, name), encoding='utf-8') as f:
+                recorded[name[:-4].replace('_', ' ')] = f.read()
+    return recorded
+
+
+class _Server(paramiko.ServerInterface):
+    def check_auth_none(self, username):
+        return paramiko.AUTH_FAILED
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return True
+
+
+class FakeSwitchServer:
+    """
+    Threaded fake switch SSH server; see the module docstring.
+    """
+    def __init__(self, port=0, latency=LATENCY, ports=None, transcripts_dir=None, bind='0.0.0.0'):
+        self.address = (bind, port)
+        self.latency = latency
+        self.ports = ports
+        self.recorded = load_transcripts(transcripts_dir) if transcripts_dir else {}
+        self.port = None
+        self.connections = 0
+        self._sock = None
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        global _host_key
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self.address)
+        self._sock.listen(512)
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="fake-switch", daemon=True).start()
+        return self.port
+
+    def stop(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _device(self, address):
+        with self._lock:
+            if address not in self._devices:
+                hostname, ports = device_for_address(address, self.ports)
+                outputs = {command: "\r\n".join(lines) for command, lines in generate_transcripts(hostname, ports).items()}
+                for command, text in self.recorded.items():
+                    outputs[command] = text.replace('{hostname}', hostname).replace('\n', '\r\n')
+                self._devices[address] = (hostname, outputs)
+            return self._devices[address]
+
+    def _accept_loop(self):
+        while self._sock:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(client,), daemon=True).start()
+
+    def _handle(self, client):
+        hostname, outputs = self._device(client.getsockname()[0])
+        transport = paramiko.Transport(client)
+        transport.add_server_key(_host_key)
+        try:
+            transport.start_server(server=_Server())
+        except (paramiko.SSHException, EOFError, OSError):
+            return
+        while transport.is_active():
+            channel = transport.accept(1)
+            if channel is not None:
+                threading.Thread(target=self._shell, args=(channel, hostname, outputs), daemon=True).start()
+
+    def _shell(self, channel, hostname, outputs):
+        mode = ">"
+        paging = True
+
+        def readline():
+            buffer = b""
+            while True:
+                char = channel.recv(1)
+                if not char:
+                    raise EOFError
+                channel.send(char)
+                if char in (b"\n", b"\r"):
+                    return buffer.decode()
+                buffer += char
+
+        try:
+            channel.send(f"\r\n{hostname}{mode}")
+            while True:
+                line = readline().strip()
+                channel.send("\r\n")
+                if line == "enable":
+                    channel.send("User Name:")
+                    readline()
+                    channel.send("\r\nPassword:")
+                    readline()
+                    channel.send("\r\n")
+                    mode = "#"
+                elif line in ("terminal datadump", "terminal length 0"):
+                    paging = False
+                elif line:
+                    command, _, pattern = line.partition(" | include ")
+                    time.sleep(self.latency * SLOW_COMMANDS.get(command, 1))
+                    text = outputs.get(command, "% Unrecognized command")
+                    if pattern and command in outputs:
+                        text = "\r\n".join(row for row in text.split("\r\n") if pattern in row)
+                    self._send_output(channel, text, paging)
+                channel.send(f"{hostname}{mode}")
+        except (EOFError, OSError):
+            pass
+        finally:
+            channel.close()
+
+    def _send_output(self, channel, text, paging):
+        lines = text.split("\r\n")
+        if not paging or len(lines) <= PAGE_LINES:
+            channel.sendall(text + "\r\n")
+            return
+        for start in range(0, len(lines), PAGE_LINES):
+            channel.sendall("\r\n".join(lines[start:start + PAGE_LINES]) + "\r\n")
+            if start + PAGE_LINES < len(lines):
+                channel.sendall(MORE)
+                key = channel.recv(1)
+                channel.sendall("\r" + " " * len(MORE) + "\r")
+                if key == b"q":
+                    break
+
+
+if __name__ == "__main__":
+    import sys
+    server = FakeSwitchServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 2222,
+                              latency=float(sys.argv[2]) if len(sys.argv) > 2 else LATENCY)
+    print(f"Fake switch listening on port {server.start()}")
+    while True:
+        time.sleep(3600)
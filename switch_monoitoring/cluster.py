@@ -0,0 +1,343 @@
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from sshconnect import logger  # Import from sshconnect.py
+
+VNODES = 64                 # Points per worker on the hash ring; more points give more even shards
+HEARTBEAT_INTERVAL = 5      # Seconds between worker heartbeats
+HEARTBEAT_TIMEOUT = 20      # A worker silent this long is dropped and its switches reassigned
+PUSH_BATCH = 50             # Results sent to the coordinator per request
+PUSH_RETRY_MAX = 60         # Longest wait between failed pushes
+REQUEST_TIMEOUT = 15        # Seconds a worker waits for the coordinator
+TOKEN_HEADER = 'X-Cluster-Token'
+# Shared secret of the coordinator and its workers; cluster mode is off without it
+CLUSTER_TOKEN = os.environ.get('SWITCH_MONITOR_CLUSTER_TOKEN')
+# Each worker logs to its own file next to the web app's log
+LOG_DIR = r"D:\Switch Monitoring tool"
+WORKER_LOG_FILE = "Switch_monitoring-{worker_id}.log"
+
+
+class WorkerOwnedError(ConnectionError):
+    """
+    Raised instead of collecting a switch that a cluster worker owns and
+    has not pushed a snapshot for yet.
+    """
+    def __init__(self, host_id, worker_id, retry_in=HEARTBEAT_INTERVAL):
+        self.host_id = host_id
+        self.worker_id = worker_id
+        self.retry_in = retry_in
+        super().__init__(f"{host_id} is collected by cluster worker {worker_id}, no snapshot received yet")
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping host ids to workers.
+
+    Every worker owns VNODES points on the ring and a host belongs to the
+    first point after its own hash, so adding or removing a worker only
+    moves the hosts next to its points, and adding a host to the inventory
+    never moves the others.
+    """
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.vnodes = vnodes
+        self._points = []   # sorted hashes
+        self._owners = []   # worker id of each point
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def nodes(self):
+        return set(self._owners)
+
+
+class Coordinator:
+    """
+    Membership and shard assignment for collector workers, kept by the web
+    app.
+
+    Workers heartbeat every HEARTBEAT_INTERVAL seconds and get back the ids
+    of the inventory hosts they own on the hash ring of live workers. A
+    worker not heard from for HEARTBEAT_TIMEOUT seconds is dropped, and the
+    survivors pick up its hosts with their next heartbeat. With no live
+    workers, local_hosts() hands every host back to the app's own
+    scheduler, so a single process works exactly as before.
+    """
+    def __init__(self, hosts_fn, timeout=HEARTBEAT_TIMEOUT):
+        self.hosts_fn = hosts_fn
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._workers = {}  # worker id -> {'joined', 'last_seen', 'address', 'results', 'unreachable'}
+        self._ring = HashRing()
+
+    def heartbeat(self, worker_id, address=None, unreachable=None, now=None):
+        """
+        Record that a worker is alive; returns the host ids it owns.
+        """
+        now = now or time.time()
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                worker = self._workers[worker_id] = {'joined': now, 'results': 0}
+                logger.info(f"Cluster: worker {worker_id} joined from {address}")
+            worker.update(last_seen=now, address=address, unreachable=unreachable or {})
+            self._expire(now)
+            ring = self._ring
+        return sorted(host_id for host_id in self.hosts_fn() if ring.owner(host_id) == worker_id)
+
+    def record_results(self, worker_id, count, now=None):
+        """
+        Count results pushed by a worker; a push also proves it is alive.
+        Returns False for a worker that is not (or no longer) a member.
+        """
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return False
+            worker['results'] += count
+            worker['last_seen'] = now or time.time()
+            return True
+
+    def local_hosts(self, hosts, now=None):
+        """
+        The hosts the app should collect itself: all of them while no
+        worker is alive, else none.
+        """
+        with self._lock:
+            self._expire(now or time.time())
+            return hosts if not self._workers else {}
+
+    def owner(self, host_id, now=None):
+        """
+        The live worker that collects host_id, or None if the app does.
+        """
+        with self._lock:
+            self._expire(now or time.time())
+            return self._ring.owner(host_id)
+
+    def unreachable_since(self, host):
+        """
+        Since when a worker's circuit breaker has skipped host, or None.
+        """
+        with self._lock:
+            for worker in self._workers.values():
+                if host in worker['unreachable']:
+                    return worker['unreachable'][host]
+        return None
+
+    def status(self, now=None):
+        now = now or time.time()
+        hosts = self.hosts_fn()
+        with self._lock:
+            self._expire(now)
+            shards = {}
+            for host_id in hosts:
+                shards.setdefault(self._ring.owner(host_id), []).append(host_id)
+            return {
+                'mode': 'cluster' if self._workers else 'single',
+                'workers': {worker_id: {'address': worker['address'], 'joined': worker['joined'],
+                                        'last_seen_ago': round(now - worker['last_seen'], 1),
+                                        'results': worker['results'],
+                                        'hosts': sorted(shards.get(worker_id, [])),
+                                        'unreachable': worker['unreachable']}
+                            for worker_id, worker in self._workers.items()},
+                'hosts': len(hosts)
+            }
+
+    def _expire(self, now):
+        expired = [worker_id for worker_id, worker in self._workers.items()
+                   if now - worker['last_seen'] > self.timeout]
+        for worker_id in expired:
+            del self._workers[worker_id]
+            logger.warning(f"Cluster: worker {worker_id} missed its heartbeats, reassigning its switches")
+        if set(self._workers) != self._ring.nodes():
+            self._ring = HashRing(sorted(self._workers))
+            logger.info(f"Cluster: {len(self._workers)} workers in the ring")
+
+
+def post_json(url, payload, token=CLUSTER_TOKEN, timeout=REQUEST_TIMEOUT):
+    """
+    POST payload as gzip-compressed JSON and return the decoded JSON reply.
+    """
+    body = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+    if token:
+        headers[TOKEN_HEADER] = token
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read() or b'{}')
+
+
+class ClusterWorker:
+    """
+    Collector side of the cluster: heartbeats to the coordinator, keeps the
+    shard it is assigned and pushes every result back.
+
+    hosts() is the hosts_fn for a CollectionScheduler and put() its
+    store_fn. Results are stored in the local cache (collectors compare
+    against the previous one) and queued; only the newest result per
+    (host, kind) waits while the coordinator is unreachable. The last
+    assignment is kept in that case, so collection goes on.
+    """
+    def __init__(self, coordinator_url, inventory_fn, cache, worker_id=None, scheduler=None,
+                 health=None):
+        self.url = coordinator_url.rstrip('/')
+        self.inventory_fn = inventory_fn
+        self.cache = cache
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.scheduler = scheduler
+        self.health = health
+        self._assigned = set()
+        self._lock = threading.Lock()
+        self._pending = {}      # (host_id, kind) -> result waiting to be pushed
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def hosts(self):
+        assigned = self._assigned
+        return {host_id: host_info for host_id, host_info in self.inventory_fn().items() if host_id in assigned}
+
+    def put(self, host_id, kind, data, collected_at=None):
+        collected_at = self.cache.put(host_id, kind, data, collected_at)
+        with self._lock:
+            self._pending[(host_id, kind)] = {'host_id': host_id, 'kind': kind,
+                                              'collected_at': collected_at, 'data': data}
+        self._wakeup.set()
+        return collected_at
+
+    def start(self):
+        for target, name in ((self._heartbeat_loop, "cluster-heartbeat"), (self._push_loop, "cluster-push")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def heartbeat(self):
+        unreachable = {}
+        if self.health is not None:
+            unreachable = {host: state['unreachable_since'] for host, state in self.health.status().items()
+                           if state['state'] == 'unreachable'}
+        reply = post_json(f"{self.url}/cluster/heartbeat",
+                          {'worker': self.worker_id, 'address': socket.gethostname(), 'unreachable': unreachable})
+        assigned = set(reply.get('hosts', []))
+        if assigned != self._assigned:
+            logger.info(f"Cluster: worker {self.worker_id} now owns {len(assigned)} switches "
+                        f"(+{len(assigned - self._assigned)} -{len(self._assigned - assigned)})")
+            self._assigned = assigned
+            if self.scheduler is not None:
+                self.scheduler.sync_now()
+        return assigned
+
+    def _heartbeat_loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.heartbeat()
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                logger.error(f"Cluster heartbeat to {self.url} failed, keeping current shard: {e}")
+            self._stopped.wait(HEARTBEAT_INTERVAL)
+
+    def _push_loop(self):
+        retry = 1
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stopped.is_set():
+                with self._lock:
+                    keys = list(self._pending)[:PUSH_BATCH]
+                    batch = [self._pending.pop(key) for key in keys]
+                if not batch:
+                    break
+                try:
+                    post_json(f"{self.url}/cluster/results", {'worker': self.worker_id, 'results': batch})
+                    retry = 1
+                except (urllib.error.URLError, OSError, ValueError) as e:
+                    logger.error(f"Pushing {len(batch)} results to {self.url} failed, retrying in {retry}s: {e}")
+                    with self._lock:
+                        for result in batch:
+                            # Keep a newer result queued meanwhile
+                            self._pending.setdefault((result['host_id'], result['kind']), result)
+                    self._stopped.wait(retry)
+                    retry = min(retry * 2, PUSH_RETRY_MAX)
+
+
+def run_worker(coordinator_url, worker_id=None):
+    """
+    Collect this worker's shard of the inventory with the web app's
+    collectors until interrupted.
+
+    The worker logs to its own file (rotation is per process) and never
+    records history; the coordinator does that for every pushed result.
+    """
+    if not CLUSTER_TOKEN:
+        raise SystemExit("Set SWITCH_MONITOR_CLUSTER_TOKEN to the coordinator's shared secret")
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    from logging_setup import configure_logging
+    os.makedirs(LOG_DIR, exist_ok=True)
+    # Installed before app3 is imported, which makes the app's own configure_logging() a no-op
+    configure_logging(os.path.join(LOG_DIR, WORKER_LOG_FILE.format(worker_id=worker_id)))
+    import app3  # Collectors and snapshot cache of the web app
+    from fleet import read_fleet_inventory
+    from host_health import host_health
+    from polling_policy import polling_policy
+    from scheduler import CollectionScheduler
+
+    worker = ClusterWorker(coordinator_url, lambda: read_fleet_inventory(app3.INVENTORY_PATH),
+                           app3.snapshot_cache, worker_id=worker_id, health=host_health)
+    scheduler = CollectionScheduler(
+        {'system': app3.collect_system_data, 'interface': app3.collect_interface_data},
+        worker.hosts,
+        app3.snapshot_cache,
+        interval_fn=lambda host_info, kind, interval: polling_policy.interval(host_info['host'], interval),
+        store_fn=worker.put)
+    worker.scheduler = scheduler
+    worker.start()
+    scheduler.start()
+    logger.info(f"Cluster worker {worker.worker_id} reporting to {coordinator_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop()
+        scheduler.stop()
+
+
+def main():
+    """
+    python cluster.py worker <coordinator url> [worker id]
+    python cluster.py status <coordinator url>
+    """
+    if len(sys.argv) < 3 or sys.argv[1] not in ('worker', 'status'):
+        print(main.__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'worker':
+        run_worker(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    else:
+        with urllib.request.urlopen(f"{sys.argv[2].rstrip('/')}/cluster", timeout=REQUEST_TIMEOUT) as response:
+            print(json.dumps(json.loads(response.read()), indent=2))
+
+if __name__ == "__main__":
+    main()
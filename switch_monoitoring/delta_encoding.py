@@ -0,0 +1,146 @@
+import difflib
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024       # Smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+TEXT_DIFF_MIN = 2048            # Changed strings at least this long are sent as line edits
+# List-valued keys diffed item by item, with the field identifying an item
+KEYED_LISTS = {'ports': 'port'}
+ENCODED_CACHE_SIZE = 1024       # Encoded bodies kept by EncodedResponses
+
+
+def compute_delta(old, new):
+    """
+    Patch turning dict old into dict new:
+
+    {'set': {key: value}, 'unset': [key],
+     'lists': {key: {'id': field, 'set': [item], 'unset': [id], 'order': [id]}},
+     'text': {key: [[start, end, [line, ...]], ...]}}
+
+    Keys in KEYED_LISTS send only the items that changed ('order' only if
+    the item order changed). Long strings send line edits, applied in
+    order, each replacing lines start..end of the result so far. Empty
+    parts are left out.
+    """
+    patch = {'set': {}, 'unset': [key for key in old if key not in new], 'lists': {}, 'text': {}}
+    for key, value in new.items():
+        previous = old.get(key)
+        if key in old and previous == value:
+            continue
+        if key in KEYED_LISTS and isinstance(previous, list) and isinstance(value, list):
+            patch['lists'][key] = _list_delta(previous, value, KEYED_LISTS[key])
+        elif (isinstance(previous, str) and isinstance(value, str)
+              and min(len(previous), len(value)) >= TEXT_DIFF_MIN):
+            edits = _text_delta(previous, value)
+            if edits is None:
+                patch['set'][key] = value
+            else:
+                patch['text'][key] = edits
+        else:
+            patch['set'][key] = value
+    return {part: content for part, content in patch.items() if content}
+
+def _list_delta(old, new, field):
+    old_items = {item.get(field): item for item in old}
+    new_ids = [item.get(field) for item in new]
+    kept = set(new_ids)
+    delta = {
+        'id': field,
+        'set': [item for item in new if old_items.get(item.get(field)) != item],
+        'unset': [item_id for item_id in old_items if item_id not in kept],
+    }
+    # Applying set/unset keeps surviving items in their old order and appends new ones
+    applied = [item_id for item_id in old_items if item_id in kept]
+    applied += [item_id for item_id in new_ids if item_id not in old_items]
+    if applied != new_ids:
+        delta['order'] = new_ids
+    return delta
+
+def _text_delta(old, new):
+    """
+    Line edits from old to new, or None if they would not be much smaller
+    than new itself.
+    """
+    old_lines = old.split('\n')
+    new_lines = new.split('\n')
+    edits = []
+    shift = 0   # Line count change from the edits applied so far
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        edits.append([i1 + shift, i2 + shift, new_lines[j1:j2]])
+        shift += (j2 - j1) - (i2 - i1)
+    if sum(len(line) + 1 for _, _, lines in edits for line in lines) > len(new) // 2:
+        return None
+    return edits
+
+def etag_for(body):
+    """
+    Content hash used as the (unquoted) ETag of a body.
+    """
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+def accepted_encoding(accept_encoding):
+    """
+    Best content coding we can produce for an Accept-Encoding header, or None.
+    """
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, GZIP_LEVEL)
+    return body
+
+
+class EncodedResponses:
+    """
+    LRU cache of serialized JSON bodies, their ETags and compressed
+    variants, keyed by whatever identifies the content (e.g. host, kind,
+    base version and version). Each distinct body is serialized, hashed
+    and compressed once no matter how many viewers fetch it.
+    """
+    def __init__(self, size=ENCODED_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> {'etag', None: body, 'gzip': body, 'br': body}
+
+    def get(self, key, build, encoding=None):
+        """
+        (etag, body, encoding used) for key; build() returns the payload to
+        serialize the first time the key is seen.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            body = json.dumps(build(), separators=(',', ':')).encode('utf-8')
+            entry = {'etag': etag_for(body), None: body}
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        body = entry[None]
+        if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+            return entry['etag'], body, None
+        if encoding not in entry:
+            entry[encoding] = compress(body, encoding)
+        return entry['etag'], entry[encoding], encoding
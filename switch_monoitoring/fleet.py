@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from sshconnect import logger  # Import from sshconnect.py
+from inventory import get_inventory
+from host_health import HostUnreachableError
+
+MAX_WORKERS = 16        # Switches polled at the same time
+HOST_TIMEOUT = 120      # Seconds one switch may take before it is reported as timed out
+
+def read_fleet_inventory(inventory_path, group=None, tag=None):
+    """
+    Connection details for every host in the inventory, optionally limited
+    to a group and/or tag (see inventory.InventoryService).
+
+    Returns a dict of host id (e.g. 'host1') to host_info.
+    """
+    inventory = get_inventory(inventory_path)
+    if group or tag:
+        return inventory.select(group=group, tag=tag)
+    return dict(inventory.hosts())
+
+def _timed(process_host, host_info, started):
+    started['at'] = time.time()
+    return process_host(host_info)
+
+def poll_fleet(process_host, hosts, max_workers=MAX_WORKERS, host_timeout=HOST_TIMEOUT):
+    """
+    Run process_host for every host concurrently on a bounded thread pool.
+
+    hosts maps host id to host_info. A host still running host_timeout
+    seconds after it started is reported as 'timeout' and the sweep moves on.
+    Returns one aggregated report dict.
+    """
+    sweep_start = time.time()
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fleet")
+    pending = {}
+    for host_id, host_info in hosts.items():
+        started = {}
+        future = executor.submit(_timed, process_host, host_info, started)
+        pending[future] = (host_id, host_info, started)
+
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            now = time.time()
+            for future in done:
+                host_id, host_info, started = pending.pop(future)
+                elapsed = round(now - started.get('at', now), 3)
+                try:
+                    results[host_id] = {'host': host_info['host'], 'status': 'ok',
+                                        'elapsed': elapsed, 'sections': future.result()}
+                except HostUnreachableError as e:
+                    # Skipped by the circuit breaker without touching the network
+                    results[host_id] = {'host': host_info['host'], 'status': 'error', 'elapsed': elapsed,
+                                        'error': str(e), 'unreachable_since': e.unreachable_since}
+                except Exception as e:
+                    logger.error(f"Fleet poll of {host_info['host']} failed: {e}")
+                    results[host_id] = {'host': host_info['host'], 'status': 'error',
+                                        'elapsed': elapsed, 'error': str(e)}
+            for future, (host_id, host_info, started) in list(pending.items()):
+                if 'at' in started and now - started['at'] > host_timeout:
+                    logger.error(f"Fleet poll of {host_info['host']} timed out after {host_timeout}s")
+                    results[host_id] = {'host': host_info['host'], 'status': 'timeout',
+                                        'elapsed': round(now - started['at'], 3),
+                                        'error': f"Timed out after {host_timeout}s"}
+                    del pending[future]
+    finally:
+        # Timed-out collections finish in the background; don't wait for them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    summary = {'ok': 0, 'error': 0, 'timeout': 0}
+    for result in results.values():
+        summary[result['status']] += 1
+    elapsed = time.time() - sweep_start
+    logger.info(f"Fleet sweep of {len(hosts)} hosts finished in {elapsed:.2f}s: {summary}")
+    return {
+        'started': sweep_start,
+        'elapsed': round(elapsed, 3),
+        'hosts': results,
+        'summary': summary
+    }
+
+def format_fleet_summary(report):
+    """
+    One line per host plus totals, for the command-line fleet mode.
+    """
+    lines = [f"Fleet sweep: {len(report['hosts'])} hosts in {report['elapsed']}s {report['summary']}"]
+    for host_id, result in sorted(report['hosts'].items()):
+        detail = f"{len(result['sections'])} sections" if result['status'] == 'ok' else result['error']
+        lines.append(f"  {host_id:<10} {result['host']:<16} {result['status']:<8} {result['elapsed']:>8}s  {detail}")
+    return "\n".join(lines)
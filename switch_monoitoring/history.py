@@ -0,0 +1,217 @@
+import sqlite3
+import threading
+import time
+from sshconnect import logger  # Import from sshconnect.py
+
+HISTORY_DB_PATH = "switch_history.db"
+BUCKET_SECONDS = 60             # Raw samples are stored at one-minute resolution
+ROLLUP_SECONDS = 3600           # Older samples are downsampled to hourly
+RAW_RETENTION_DAYS = 28         # Keep one-minute data this long
+ROLLUP_RETENTION_DAYS = 365     # Keep hourly data this long
+BATCH_SIZE = 500                # Buffered rows written per transaction
+FLUSH_INTERVAL = 10             # Seconds before a partial batch is written anyway
+MAINTENANCE_INTERVAL = 3600     # Seconds between rollup/retention passes
+
+SYSTEM_METRICS = ('cpu_5s', 'cpu_1m', 'cpu_5m', 'poe_nominal_watts', 'poe_consumed_watts')
+PORT_METRICS = ('link_up', 'in_octets', 'out_octets', 'crc_errors', 'input_errors', 'output_errors', 'drops')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS system_metrics (
+    switch TEXT NOT NULL, ts INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in SYSTEM_METRICS)},
+    PRIMARY KEY (switch, ts)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS system_metrics_hourly (
+    switch TEXT NOT NULL, ts INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in SYSTEM_METRICS)},
+    PRIMARY KEY (switch, ts)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS port_metrics (
+    switch TEXT NOT NULL, port TEXT NOT NULL, ts INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in PORT_METRICS)},
+    PRIMARY KEY (switch, port, ts)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS port_metrics_hourly (
+    switch TEXT NOT NULL, port TEXT NOT NULL, ts INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in PORT_METRICS)},
+    PRIMARY KEY (switch, port, ts)) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """
+    Append-only SQLite store of CPU, PoE and per-port counters keyed by
+    switch, port and minute.
+
+    Writes are buffered and inserted in batches. A periodic maintenance pass
+    rolls one-minute rows older than RAW_RETENTION_DAYS up into hourly rows
+    (averages for gauges, last value for cumulative counters) and drops
+    hourly rows older than ROLLUP_RETENTION_DAYS, so the file stays bounded.
+
+    The database is opened on first use, so processes that import the app
+    without recording history (cluster workers) never open it.
+    """
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self._system_rows = []
+        self._port_rows = []
+        self._last_flush = time.time()
+        self._last_maintenance = 0
+
+    @property
+    def _conn(self):
+        # Only called with self._lock held
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def record_system(self, switch, cpu=None, power=None, timestamp=None):
+        """
+        Buffer one system sample (parsers.parse_cpu_utilization / parse_power_inline output).
+        """
+        cpu = cpu or {}
+        power = power or {}
+        row = (switch, self._bucket(timestamp),
+               cpu.get('five_seconds'), cpu.get('one_minute'), cpu.get('five_minutes'),
+               power.get('nominal_watts'), power.get('consumed_watts'))
+        with self._lock:
+            self._system_rows.append(row)
+        self._maybe_flush()
+
+    def record_ports(self, switch, ports, timestamp=None):
+        """
+        Buffer one sample per port (parsers.ports_to_json output).
+        """
+        bucket = self._bucket(timestamp)
+        rows = []
+        for port in ports:
+            link = port.get('link_state')
+            link_up = None if link is None else (1 if link == 'up' else 0)
+            rows.append((switch, port['port'], bucket, link_up,
+                         port.get('in_octets'), port.get('out_octets'), port.get('crc_errors'),
+                         port.get('input_errors'), port.get('output_errors'), port.get('drops')))
+        with self._lock:
+            self._port_rows.extend(rows)
+        self._maybe_flush()
+
+    def flush(self):
+        with self._lock:
+            system_rows, self._system_rows = self._system_rows, []
+            port_rows, self._port_rows = self._port_rows, []
+            self._last_flush = time.time()
+            if not system_rows and not port_rows:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO system_metrics VALUES ({', '.join('?' * (2 + len(SYSTEM_METRICS)))})",
+                    system_rows)
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO port_metrics VALUES ({', '.join('?' * (3 + len(PORT_METRICS)))})",
+                    port_rows)
+        logger.debug(f"History flush: {len(system_rows)} system rows, {len(port_rows)} port rows")
+
+    def maintain(self, now=None):
+        """
+        Roll expired one-minute rows up to hourly and apply retention.
+
+        Uses its own connection, so recording and queries are not blocked
+        while it runs; call it from a background thread (see maybe_maintain).
+        """
+        now = now or time.time()
+        with self._lock:
+            self._conn   # Creates the schema on first use
+        raw_cutoff = int(now - RAW_RETENTION_DAYS * 86400) // ROLLUP_SECONDS * ROLLUP_SECONDS
+        rollup_cutoff = int(now - ROLLUP_RETENTION_DAYS * 86400)
+        gauges = ', '.join(f'AVG({name})' for name in SYSTEM_METRICS)
+        # Cumulative counters keep the last value of the hour; link state its minimum
+        counters = ', '.join('MIN(link_up)' if name == 'link_up' else f'MAX({name})' for name in PORT_METRICS)
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO system_metrics_hourly "
+                    f"SELECT switch, ts / {ROLLUP_SECONDS} * {ROLLUP_SECONDS} AS hour, {gauges} "
+                    f"FROM system_metrics WHERE ts < ? GROUP BY switch, hour", (raw_cutoff,))
+                conn.execute(
+                    f"INSERT OR REPLACE INTO port_metrics_hourly "
+                    f"SELECT switch, port, ts / {ROLLUP_SECONDS} * {ROLLUP_SECONDS} AS hour, {counters} "
+                    f"FROM port_metrics WHERE ts < ? GROUP BY switch, port, hour", (raw_cutoff,))
+                conn.execute("DELETE FROM system_metrics WHERE ts < ?", (raw_cutoff,))
+                conn.execute("DELETE FROM port_metrics WHERE ts < ?", (raw_cutoff,))
+                conn.execute("DELETE FROM system_metrics_hourly WHERE ts < ?", (rollup_cutoff,))
+                conn.execute("DELETE FROM port_metrics_hourly WHERE ts < ?", (rollup_cutoff,))
+        finally:
+            conn.close()
+        self._last_maintenance = now
+
+    def maybe_maintain(self, now=None):
+        """
+        Flush and run maintain() once MAINTENANCE_INTERVAL has passed; meant
+        for the collection scheduler's thread, never the request path.
+        """
+        now = now or time.time()
+        self.flush()
+        if now - self._last_maintenance >= MAINTENANCE_INTERVAL:
+            try:
+                self.maintain(now)
+            except sqlite3.Error as e:
+                logger.error(f"History maintenance failed: {e}")
+
+    def query_system(self, switch, metric, start, end, step=None):
+        """
+        [(timestamp, value)] for a system metric between start and end.
+        """
+        if metric not in SYSTEM_METRICS:
+            raise ValueError(f"Unknown system metric '{metric}'")
+        return self._query('system_metrics', metric, 'switch = ?', (switch,), start, end, step, 'AVG')
+
+    def query_port(self, switch, port, metric, start, end, step=None):
+        """
+        [(timestamp, value)] for a port metric between start and end.
+        """
+        if metric not in PORT_METRICS:
+            raise ValueError(f"Unknown port metric '{metric}'")
+        aggregate = 'MIN' if metric == 'link_up' else 'MAX'
+        return self._query('port_metrics', metric, 'switch = ? AND port = ?', (switch, port),
+                           start, end, step, aggregate)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _query(self, table, metric, where, params, start, end, step, aggregate):
+        self.flush()
+        start, end = int(start), int(end)
+        # Ranges reaching past the one-minute retention are bucketed at least hourly
+        if start >= time.time() - RAW_RETENTION_DAYS * 86400:
+            step = int(max(step or BUCKET_SECONDS, BUCKET_SECONDS))
+        else:
+            step = int(max(step or ROLLUP_SECONDS, ROLLUP_SECONDS))
+        # maintain() rolled up and deleted every raw row before the hour after the
+        # series' newest hourly row, so hourly rows cover up to there and raw rows
+        # the rest. One statement reads the split and both tables from the same
+        # snapshot, so a maintenance pass committing meanwhile cannot open a gap.
+        sql = (f"SELECT ts / {step} * {step} AS bucket, {aggregate}(value) FROM ("
+               f"SELECT ts, {metric} AS value FROM {table}_hourly WHERE {where} AND ts >= ? AND ts <= ? "
+               f"UNION ALL "
+               f"SELECT ts, {metric} FROM {table} WHERE {where} AND ts <= ? AND ts >= MAX(?, "
+               f"(SELECT COALESCE(MAX(ts) + {ROLLUP_SECONDS}, 0) FROM {table}_hourly WHERE {where}))) "
+               f"GROUP BY bucket ORDER BY bucket")
+        with self._lock:
+            return self._conn.execute(sql, params + (start, end) + params + (end, start) + params).fetchall()
+
+    def _bucket(self, timestamp):
+        return int(timestamp or time.time()) // BUCKET_SECONDS * BUCKET_SECONDS
+
+    def _maybe_flush(self):
+        now = time.time()
+        with self._lock:
+            pending = len(self._system_rows) + len(self._port_rows)
+            due = pending >= BATCH_SIZE or now - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
@@ -0,0 +1,172 @@
+import logging
+import socket
+import threading
+import time
+from sshconnect import logger, SSH_PORT  # Import from sshconnect.py
+
+# Circuit breaker tuning
+FAILURE_THRESHOLD = 3       # Consecutive connect/auth failures before a switch is skipped
+BACKOFF_BASE = 30           # Seconds before the first probe of a skipped switch
+BACKOFF_MAX = 900           # Longest wait between probes
+PROBE_TIMEOUT = 2           # Seconds the TCP pre-check waits for the SSH port
+
+BANNER_ERROR = 'Error reading SSH protocol banner'
+
+
+class BannerNoiseFilter(logging.Filter):
+    """
+    Drops the banner-read error paramiko logs, line by line with its
+    traceback, for connections closed before the SSH banner (the TCP
+    pre-check, half-open probes); sshconnect/record_failure logs those
+    failures once. Every other transport record is kept.
+    """
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def filter(self, record):
+        if BANNER_ERROR in record.getMessage():
+            self._local.dropping = True
+        # The traceback lines follow in the same transport thread, which then exits
+        return not getattr(self._local, 'dropping', False)
+
+
+logging.getLogger('paramiko.transport').addFilter(BannerNoiseFilter())
+
+
+class HostUnreachableError(ConnectionError):
+    """
+    Raised instead of connecting while a switch's circuit breaker is open.
+    """
+    def __init__(self, host, unreachable_since, retry_in):
+        self.host = host
+        self.unreachable_since = unreachable_since
+        self.retry_in = retry_in
+        since = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(unreachable_since))
+        super().__init__(f"{host} unreachable since {since}, next probe in {retry_in:.0f}s")
+
+
+def tcp_reachable(host, port=SSH_PORT, timeout=PROBE_TIMEOUT):
+    """
+    (True, None) if the SSH port accepts a TCP connection within timeout,
+    else (False, reason). Much cheaper than a failed paramiko handshake.
+    """
+    try:
+        with socket.create_connection((host, int(port or SSH_PORT)), timeout=timeout):
+            return True, None
+    except OSError as e:
+        return False, str(e) or type(e).__name__
+
+
+class _HostState:
+    __slots__ = ('failures', 'unreachable_since', 'next_probe', 'probing', 'last_error', 'last_success')
+
+    def __init__(self):
+        self.failures = 0
+        self.unreachable_since = None
+        self.next_probe = 0.0
+        self.probing = False
+        self.last_error = None
+        self.last_success = None
+
+
+class HostHealth:
+    """
+    Per-switch circuit breaker for the collection path.
+
+    After FAILURE_THRESHOLD consecutive connect or auth failures a switch
+    is skipped: check() raises HostUnreachableError at once instead of
+    waiting for SSH timeouts. Once the backoff has passed a single caller is
+    let through as a probe; its failure doubles the backoff (up to
+    BACKOFF_MAX), its success closes the breaker.
+    """
+    def __init__(self, threshold=FAILURE_THRESHOLD, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.threshold = threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._hosts = {}    # host -> _HostState
+
+    def check(self, host, now=None):
+        """
+        Raise HostUnreachableError if host should not be contacted now.
+        """
+        now = now or time.time()
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.failures < self.threshold:
+                return
+            if now >= state.next_probe and not state.probing:
+                state.probing = True
+                logger.info(f"Probing unreachable switch {host}")
+                return
+            retry_in = max(state.next_probe - now, 0)
+            since = state.unreachable_since
+        raise HostUnreachableError(host, since, retry_in)
+
+    def record_success(self, host, now=None):
+        now = now or time.time()
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            if state.failures >= self.threshold:
+                logger.info(f"Switch {host} reachable again")
+            state.failures = 0
+            state.unreachable_since = None
+            state.probing = False
+            state.last_error = None
+            state.last_success = now
+
+    def record_failure(self, host, error, now=None):
+        now = now or time.time()
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.failures += 1
+            state.probing = False
+            state.last_error = str(error)
+            if state.unreachable_since is None:
+                state.unreachable_since = now
+            if state.failures >= self.threshold:
+                backoff = min(self.backoff_base * 2 ** (state.failures - self.threshold), self.backoff_max)
+                state.next_probe = now + backoff
+                logger.warning(f"Switch {host} failed {state.failures} times in a row, "
+                               f"skipping it for {backoff:.0f}s: {error}")
+
+    def unreachable_since(self, host):
+        """
+        Time the current failure streak began if the breaker is open, else None.
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.failures < self.threshold:
+                return None
+            return state.unreachable_since
+
+    def status(self, now=None):
+        """
+        {host: {'state', 'failures', 'unreachable_since', 'next_probe_in', 'last_error', 'last_success'}}.
+        """
+        now = now or time.time()
+        with self._lock:
+            result = {}
+            for host, state in self._hosts.items():
+                is_open = state.failures >= self.threshold
+                result[host] = {
+                    'state': 'unreachable' if is_open else 'ok' if not state.failures else 'degraded',
+                    'failures': state.failures,
+                    'unreachable_since': state.unreachable_since if is_open else None,
+                    'next_probe_in': round(max(state.next_probe - now, 0), 1) if is_open else None,
+                    'last_error': state.last_error,
+                    'last_success': state.last_success
+                }
+        return result
+
+    def reset(self, host=None):
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+
+# Shared by the session pool and the Flask app
+host_health = HostHealth()
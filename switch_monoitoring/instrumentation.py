@@ -0,0 +1,192 @@
+import cProfile
+import functools
+import io
+import math
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+RECENT_SPANS = 1000     # Individual spans kept for inspection, newest last
+PROFILE_LIMIT = 25      # Functions listed by profile_call
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram with count, sum, min, max and any
+    numeric extras (bytes, pages, ...) summed alongside.
+    """
+    __slots__ = ('counts', 'count', 'total', 'minimum', 'maximum', 'extras')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.extras = {}
+
+    def observe(self, seconds, extras=None):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        for name, value in (extras or {}).items():
+            if isinstance(value, (int, float)):
+                self.extras[name] = self.extras.get(name, 0) + value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th quantile (0 < q <= 1).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.maximum), 4)
+        return round(self.maximum, 4)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 4),
+            'mean': round(self.total / self.count, 4) if self.count else None,
+            'min': round(self.minimum, 4) if self.count else None,
+            'max': round(self.maximum, 4),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {('+Inf' if bound == math.inf else str(bound)): count
+                        for bound, count in zip(LATENCY_BUCKETS, self.counts)},
+            **{name: round(value, 4) for name, value in self.extras.items()},
+        }
+
+
+class Instrumentation:
+    """
+    Timing spans for the collection pipeline (connect, enable, commands,
+    parsers), aggregated into latency histograms per stage, per stage and
+    name (e.g. the command) and per stage and host.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}     # stage -> Histogram
+        self._names = {}      # (stage, name) -> Histogram
+        self._hosts = {}      # (host, stage) -> Histogram
+        self._recent = deque(maxlen=RECENT_SPANS)
+
+    def observe(self, stage, seconds, host=None, name=None, **extras):
+        """
+        Record one finished span of the given stage.
+        """
+        with self._lock:
+            self._stages.setdefault(stage, Histogram()).observe(seconds, extras)
+            if name is not None:
+                self._names.setdefault((stage, name), Histogram()).observe(seconds, extras)
+            if host is not None:
+                self._hosts.setdefault((host, stage), Histogram()).observe(seconds, extras)
+            self._recent.append({'stage': stage, 'name': name, 'host': host, 'seconds': round(seconds, 4),
+                                 'timestamp': time.time(), **extras})
+
+    def recent(self, limit=RECENT_SPANS):
+        """
+        The last limit spans, newest last, copied under the lock so that
+        concurrent observe() calls cannot change them while they are read.
+        """
+        with self._lock:
+            return list(self._recent)[-limit:]
+
+    @contextmanager
+    def span(self, stage, host=None, name=None, **extras):
+        """
+        Time the enclosed block; the yielded dict can carry extras set inside it.
+        """
+        started = time.perf_counter()
+        try:
+            yield extras
+        finally:
+            self.observe(stage, time.perf_counter() - started, host=host, name=name, **extras)
+
+    def summary(self):
+        with self._lock:
+            stages = {stage: hist.to_dict() for stage, hist in self._stages.items()}
+            names = {}
+            for (stage, name), hist in self._names.items():
+                names.setdefault(stage, {})[name] = hist.to_dict()
+            hosts = {}
+            for (host, stage), hist in self._hosts.items():
+                hosts.setdefault(host, {})[stage] = hist.to_dict()
+        return {'stages': stages, 'by_name': names, 'hosts': hosts}
+
+    def format_summary(self):
+        """
+        Plain-text table of the stage and per-command latencies.
+        """
+        summary = self.summary()
+        lines = ["COLLECTOR TIMINGS", "=================",
+                 f"{'stage / name':<44} {'count':>6} {'mean':>8} {'p95':>8} {'max':>8} {'total':>9}"]
+
+        def row(label, stats):
+            return (f"{label[:44]:<44} {stats['count']:>6} {stats['mean'] or 0:>8.3f} "
+                    f"{stats['p95'] or 0:>8.3f} {stats['max']:>8.3f} {stats['sum']:>9.3f}")
+
+        for stage, stats in sorted(summary['stages'].items()):
+            lines.append(row(stage, stats))
+            for name, name_stats in sorted(summary['by_name'].get(stage, {}).items(),
+                                           key=lambda item: -item[1]['sum']):
+                lines.append(row(f"  {name}", name_stats))
+        for host, stages in sorted(summary['hosts'].items()):
+            total = sum(stats['sum'] for stats in stages.values())
+            lines.append(f"{host + ' (all spans)':<44} {'':>6} {'':>8} {'':>8} {'':>8} {total:>9.3f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._names.clear()
+            self._hosts.clear()
+            self._recent.clear()
+
+
+def timed(stage):
+    """
+    Decorator recording each call of the function as a span named after it.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                instrumentation.observe(stage, time.perf_counter() - started, name=func.__name__)
+        return wrapper
+    return decorate
+
+def profile_call(func, *args, output_path=None, limit=PROFILE_LIMIT, **kwargs):
+    """
+    Run func once under cProfile, print the top functions by cumulative time
+    and optionally save the raw stats to output_path (for snakeviz etc.).
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        if output_path:
+            profiler.dump_stats(output_path)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+        print(stream.getvalue())
+
+
+# Shared by the collectors, the session pool and the Flask app
+instrumentation = Instrumentation()
@@ -0,0 +1,178 @@
+import configparser
+import os
+import threading
+import time
+from sshconnect import logger, DEFAULT_PLATFORM  # Import from sshconnect.py
+
+RELOAD_CHECK_INTERVAL = 2   # Seconds between checks of the inventory file's mtime
+HOST_SETTINGS = ('username', 'password', 'platform', 'port', 'interval', 'label')
+
+
+def _split_list(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def parse_inventory(config):
+    """
+    Build {host_id: host_info} from a parsed inventory.ini.
+
+    [switches] lists 'hostN = address' entries and the shared username,
+    password and optional platform. Optional sections refine that:
+
+        [group:core]              settings shared by the members of a group
+        platform = cisco_ios
+
+        [host:host1]              per-host settings; may also add a host
+        address = 10.0.0.1        that is not listed under [switches]
+        groups = core, building-a
+        tags = poe, critical
+        username = netops
+        password = secret
+
+    Settings apply in the order [switches], then each group, then the host.
+    """
+    defaults = dict(config['switches']) if config.has_section('switches') else {}
+    addresses = {key: value.strip() for key, value in defaults.items() if key.startswith('host')}
+    host_sections = {}
+    group_sections = {}
+    for section in config.sections():
+        kind, _, name = section.partition(':')
+        if kind == 'host' and name:
+            host_sections[name] = config[section]
+            if config[section].get('address'):
+                addresses[name] = config[section]['address'].strip()
+        elif kind == 'group' and name:
+            group_sections[name] = config[section]
+    if not addresses:
+        raise Exception("Section 'switches' not found in inventory.ini")
+
+    hosts = {}
+    for host_id, address in addresses.items():
+        host_section = host_sections.get(host_id, {})
+        groups = _split_list(host_section.get('groups'))
+        info = {'id': host_id, 'host': address, 'platform': DEFAULT_PLATFORM}
+        for layer in [defaults] + [group_sections.get(group, {}) for group in groups] + [host_section]:
+            for setting in HOST_SETTINGS:
+                if layer.get(setting):
+                    info[setting] = layer[setting]
+        info.setdefault('username', '')
+        info.setdefault('password', '')
+        info['groups'] = groups
+        info['tags'] = _split_list(host_section.get('tags'))
+        hosts[host_id] = info
+    return hosts
+
+
+class InventoryService:
+    """
+    inventory.ini loaded once and kept in memory, with lookups by host id,
+    IP address, group and tag.
+
+    The file is re-read only when its modification time or size changes
+    (checked at most every RELOAD_CHECK_INTERVAL seconds). A file that fails
+    to parse keeps the last good inventory in service.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0
+        self._hosts = {}
+        self._by_ip = {}
+        self._groups = {}
+        self._tags = {}
+        self._loaded = False
+
+    def hosts(self):
+        """
+        {host_id: host_info} in file order. Treat the result as read-only.
+        """
+        self._refresh()
+        return self._hosts
+
+    def get(self, host_id):
+        self._refresh()
+        return self._hosts.get(host_id)
+
+    def by_ip(self, address):
+        """
+        host_info for an IP address, or None.
+        """
+        self._refresh()
+        host_id = self._by_ip.get(address)
+        return self._hosts.get(host_id) if host_id else None
+
+    def groups(self):
+        self._refresh()
+        return {group: list(members) for group, members in self._groups.items()}
+
+    def select(self, group=None, tag=None):
+        """
+        {host_id: host_info} for hosts in the group and/or carrying the tag.
+        """
+        self._refresh()
+        host_ids = None
+        if group:
+            host_ids = set(self._groups.get(group, ()))
+        if tag:
+            tagged = set(self._tags.get(tag, ()))
+            host_ids = tagged if host_ids is None else host_ids & tagged
+        if host_ids is None:
+            return dict(self._hosts)
+        return {host_id: info for host_id, info in self._hosts.items() if host_id in host_ids}
+
+    def _refresh(self):
+        now = time.time()
+        if self._loaded and now - self._checked < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if self._loaded and now - self._checked < RELOAD_CHECK_INTERVAL:
+                return
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+            if self._loaded and signature == self._signature:
+                return
+            try:
+                self._load(signature)
+            except Exception as e:
+                if not self._loaded:
+                    raise
+                logger.error(f"Keeping previous inventory, reload of {self.path} failed: {e}")
+                self._signature = signature
+
+    def _load(self, signature):
+        config = configparser.ConfigParser()
+        config.read(self.path)
+        hosts = parse_inventory(config)
+        by_ip = {}
+        groups = {}
+        tags = {}
+        for host_id, info in hosts.items():
+            by_ip.setdefault(info['host'], host_id)
+            for group in info['groups']:
+                groups.setdefault(group, []).append(host_id)
+            for tag in info['tags']:
+                tags.setdefault(tag, []).append(host_id)
+        # Swap in the new indexes together so readers never see a mix
+        self._hosts, self._by_ip, self._groups, self._tags = hosts, by_ip, groups, tags
+        self._signature = signature
+        self._loaded = True
+        logger.info(f"Loaded inventory {self.path}: {len(hosts)} hosts, {len(groups)} groups")
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+def get_inventory(path):
+    """
+    Shared InventoryService for an inventory file path.
+    """
+    with _services_lock:
+        service = _services.get(path)
+        if service is None:
+            service = _services[path] = InventoryService(path)
+        return service
@@ -0,0 +1,254 @@
+import re
+import socketserver
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from parsers import normalize_port
+from instrumentation import timed
+from sshconnect import logger  # Import from sshconnect.py
+
+FLAP_WINDOW = 3600          # Seconds of link events counted towards a port's flap rate
+MAX_EVENTS_PER_PORT = 500   # Link events kept per port
+RECENT_LINES = 50           # Newest log lines kept per switch for the report section
+SYSLOG_PORT = 5514          # UDP port of the local syslog listener (514 needs root)
+SYSLOG_FRESHNESS = 3600     # Seconds a switch's syslog feed counts as live
+
+# Optional "123456 " (Cisco SB) or "000123: " (IOS service sequence-numbers) prefix
+LOG_SEQUENCE = re.compile(r'^\s*(\d+):?\s+')
+# "01-Jan-2024 10:00:00" (Cisco SB) and "*Mar  1 2024 00:00:01.123" / "Mar  1 00:00:01" (IOS)
+LOG_TIMESTAMPS = [
+    (re.compile(r'(\d{2}-[A-Za-z]{3}-\d{4} \d{2}:\d{2}:\d{2})'), '%d-%b-%Y %H:%M:%S'),
+    (re.compile(r'\*?([A-Z][a-z]{2}\s+\d{1,2} \d{4} \d{2}:\d{2}:\d{2})'), '%b %d %Y %H:%M:%S'),
+    (re.compile(r'\*?([A-Z][a-z]{2}\s+\d{1,2} \d{2}:\d{2}:\d{2})'), '%b %d %H:%M:%S'),
+]
+# "%LINK-W-Down:  gi1/0/1" (Cisco SB) and
+# "%LINK-3-UPDOWN: Interface GigabitEthernet1/0/1, changed state to down" (IOS)
+LINK_EVENTS = [
+    (re.compile(r'%LINK-\w-(Up|Down):\s*(\S+)'), 1, 2),
+    (re.compile(r'%LINK-\d-UPDOWN:\s*Interface (\S+), changed state to (up|down)', re.IGNORECASE), 2, 1),
+]
+
+
+class LogEntry:
+    """
+    One line of switch log output, with its link event if it has one.
+    """
+    __slots__ = ('line', 'sequence', 'timestamp', 'port', 'state')
+
+    def __init__(self, line, sequence=None, timestamp=None, port=None, state=None):
+        self.line = line
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.port = port
+        self.state = state
+
+    def __repr__(self):
+        return f"LogEntry({self.sequence!r}, {self.port!r}, {self.state!r})"
+
+
+def _parse_timestamp(line):
+    for pattern, fmt in LOG_TIMESTAMPS:
+        match = pattern.search(line)
+        if not match:
+            continue
+        value = ' '.join(match.group(1).split('.')[0].split())
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if '%Y' not in fmt:
+            parsed = parsed.replace(year=datetime.now().year)
+        return parsed.timestamp()
+    return None
+
+def parse_link_event(line):
+    """
+    (port, 'up'|'down') for a link up/down message, else None.
+    """
+    for pattern, state_group, port_group in LINK_EVENTS:
+        match = pattern.search(line)
+        if match:
+            return normalize_port(match.group(port_group).rstrip(',')), match.group(state_group).lower()
+    return None
+
+@timed('parse')
+def parse_log_entries(text):
+    """
+    Parse 'show log' / 'show logging' output into LogEntry objects, oldest first.
+    """
+    entries = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or '%' not in line:
+            continue
+        sequence = LOG_SEQUENCE.match(line)
+        event = parse_link_event(line)
+        entries.append(LogEntry(line,
+                                sequence=int(sequence.group(1)) if sequence else None,
+                                timestamp=_parse_timestamp(line),
+                                port=event[0] if event else None,
+                                state=event[1] if event else None))
+    # Cisco SB lists the newest entry first
+    if len(entries) > 1:
+        first, last = entries[0], entries[-1]
+        if first.sequence is not None and last.sequence is not None:
+            newest_first = first.sequence > last.sequence
+        else:
+            newest_first = first.timestamp is not None and last.timestamp is not None and first.timestamp > last.timestamp
+        if newest_first:
+            entries.reverse()
+    return entries
+
+
+class FlapTracker:
+    """
+    Per-switch log cursor and per-port link event history.
+
+    Each poll of the switch log is compared against the last sequence
+    number (or timestamp, for logs without sequence numbers) seen for that
+    switch and only newer entries are kept. Link up/down events are stored
+    per port and counted over a sliding FLAP_WINDOW.
+    """
+    def __init__(self, window=FLAP_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._cursors = {}     # switch -> (sequence, timestamp, lines at that timestamp)
+        self._events = {}      # switch -> {port: deque of (time, state)}
+        self._recent = {}      # switch -> deque of log lines
+        self._syslog_seen = {}  # switch -> last syslog message time
+
+    def ingest(self, switch, text, now=None):
+        """
+        Feed one 'show log' output and return the LogEntry objects not seen before.
+        """
+        now = now or time.time()
+        entries = parse_log_entries(text)
+        with self._lock:
+            new_entries = self._after_cursor(switch, entries)
+            if entries:
+                newest = entries[-1]
+                same_time = {entry.line for entry in entries
+                             if newest.timestamp is not None and entry.timestamp == newest.timestamp}
+                self._cursors[switch] = (newest.sequence, newest.timestamp, same_time)
+            # Place device times relative to the newest entry so switch clock skew does not matter
+            reference = max((entry.timestamp for entry in entries if entry.timestamp is not None), default=None)
+            for entry in new_entries:
+                if entry.timestamp is not None and reference is not None:
+                    event_time = now - max(reference - entry.timestamp, 0)
+                else:
+                    event_time = now
+                self._record(switch, entry, event_time)
+        if new_entries:
+            logger.debug(f"{switch}: {len(new_entries)} new log entries")
+        return new_entries
+
+    def ingest_syslog(self, switch, message, now=None):
+        """
+        Feed one syslog message received from the switch.
+        """
+        now = now or time.time()
+        event = parse_link_event(message)
+        entry = LogEntry(message.strip(), port=event[0] if event else None, state=event[1] if event else None)
+        with self._lock:
+            self._syslog_seen[switch] = now
+            self._record(switch, entry, now)
+        return entry
+
+    def has_live_feed(self, switch, now=None):
+        """
+        True if the switch sent syslog recently enough that polling its log can be skipped.
+        """
+        now = now or time.time()
+        with self._lock:
+            seen = self._syslog_seen.get(switch)
+        return seen is not None and now - seen < SYSLOG_FRESHNESS
+
+    def recent_lines(self, switch):
+        with self._lock:
+            return list(self._recent.get(switch, ()))
+
+    def flaps(self, switch, now=None):
+        """
+        {port: {'changes', 'flaps', 'flaps_per_hour', 'last_state', 'last_change'}}
+        for ports with link events inside the window.
+        """
+        now = now or time.time()
+        start = now - self.window
+        result = {}
+        with self._lock:
+            ports = list(self._events.get(switch, {}).items())
+            for port, events in ports:
+                while events and events[0][0] < start:
+                    events.popleft()
+                if not events:
+                    continue
+                downs = sum(1 for _, state in events if state == 'down')
+                result[port] = {
+                    'changes': len(events),
+                    'flaps': downs,
+                    'flaps_per_hour': round(downs * 3600 / self.window, 2),
+                    'last_state': events[-1][1],
+                    'last_change': events[-1][0]
+                }
+        return result
+
+    def _after_cursor(self, switch, entries):
+        cursor = self._cursors.get(switch)
+        if cursor is None:
+            return entries
+        sequence, timestamp, same_time = cursor
+        sequenced = [entry for entry in entries if entry.sequence is not None]
+        if sequence is not None and sequenced:
+            # A buffer whose newest entry is older than the cursor was cleared or the switch restarted
+            if sequenced[-1].sequence < sequence:
+                return entries
+            return [entry for entry in entries if entry.sequence is not None and entry.sequence > sequence]
+        if timestamp is not None:
+            return [entry for entry in entries if entry.timestamp is not None and
+                    (entry.timestamp > timestamp or (entry.timestamp == timestamp and entry.line not in same_time))]
+        return []
+
+    def _record(self, switch, entry, event_time):
+        self._recent.setdefault(switch, deque(maxlen=RECENT_LINES)).append(entry.line)
+        if entry.port is None:
+            return
+        ports = self._events.setdefault(switch, {})
+        ports.setdefault(entry.port, deque(maxlen=MAX_EVENTS_PER_PORT)).append((event_time, entry.state))
+
+
+class _SyslogHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = self.request[0]
+        message = data.decode('utf-8', errors='replace')
+        self.server.tracker.ingest_syslog(self.client_address[0], message)
+
+
+class SyslogListener:
+    """
+    Background UDP syslog receiver feeding link events into a FlapTracker,
+    keyed by the sending switch's IP address.
+    """
+    def __init__(self, tracker, host='0.0.0.0', port=SYSLOG_PORT):
+        self.tracker = tracker
+        self.address = (host, port)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = socketserver.ThreadingUDPServer(self.address, _SyslogHandler)
+        self._server.daemon_threads = True
+        self._server.tracker = self.tracker
+        self._thread = threading.Thread(target=self._server.serve_forever, name='syslog-listener', daemon=True)
+        self._thread.start()
+        logger.info(f"Syslog listener on udp/{self.address[1]}")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Shared by the interface collector and the syslog listener
+flap_tracker = FlapTracker()
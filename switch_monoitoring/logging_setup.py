@@ -0,0 +1,84 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Logging settings; the level can be overridden with SWITCH_MONITOR_LOG_LEVEL
+LOG_LEVEL = os.environ.get('SWITCH_MONITOR_LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = 10 * 1024 * 1024   # Size at which the log file is rotated
+LOG_BACKUP_COUNT = 5               # Rotated files kept next to the active one
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+_lock = threading.Lock()
+_listener = None
+_file_handler = None
+
+
+def configure_logging(log_file, level=None, console=False):
+    """
+    Send all logging through a queue to a size-rotated log file (and the
+    console if asked), written by a background listener thread.
+
+    Callers only pay for putting the record on the queue, so collection is
+    never blocked on disk writes. Safe to call more than once; only the
+    first call installs the handlers.
+    """
+    global _listener, _file_handler
+    with _lock:
+        if _listener is not None:
+            return _listener
+        formatter = logging.Formatter(LOG_FORMAT)
+        _file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                            encoding='utf-8', delay=True)
+        _file_handler.setFormatter(formatter)
+        handlers = [_file_handler]
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel((level or LOG_LEVEL).upper())
+        # Transport-level chatter from paramiko is rarely useful at DEBUG
+        logging.getLogger('paramiko').setLevel(max(root.level, logging.INFO))
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+def set_level(level):
+    """
+    Change the log level at runtime, e.g. set_level('DEBUG') to capture full command output.
+    """
+    logging.getLogger().setLevel(level.upper())
+
+def rollover_logs():
+    """
+    Start a fresh log file, keeping the previous one as a rotated backup.
+    """
+    with _lock:
+        handler = _file_handler
+    if handler is None:
+        return False
+    handler.acquire()
+    try:
+        handler.doRollover()
+    finally:
+        handler.release()
+    return True
+
+def stop_logging():
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,125 @@
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# name -> (type, help), in output order
+METRIC_FAMILIES = {
+    'switch_cpu_utilization_percent': ('gauge', 'CPU utilization averaged over the window label.'),
+    'switch_poe_nominal_watts': ('gauge', 'Nominal PoE power budget in watts.'),
+    'switch_poe_consumed_watts': ('gauge', 'PoE power consumed in watts.'),
+    'switch_port_link_up': ('gauge', 'Port link state (1 up, 0 down).'),
+    'switch_port_in_octets_total': ('counter', 'Octets received on the port.'),
+    'switch_port_out_octets_total': ('counter', 'Octets sent on the port.'),
+    'switch_port_crc_errors_total': ('counter', 'CRC/FCS errors received on the port.'),
+    'switch_port_input_errors_total': ('counter', 'Input errors on the port.'),
+    'switch_port_output_errors_total': ('counter', 'Output errors on the port.'),
+    'switch_port_drops_total': ('counter', 'Packets dropped on the port.'),
+    'switch_port_link_flaps': ('gauge', 'Link down events on the port in the flap window.'),
+    'switch_collection_duration_seconds': ('gauge', 'Wall time of the last collection.'),
+    'switch_last_collection_timestamp_seconds': ('gauge', 'Unix time of the last collection.'),
+}
+
+# PortRecord field -> port counter family
+PORT_COUNTERS = {
+    'in_octets': 'switch_port_in_octets_total',
+    'out_octets': 'switch_port_out_octets_total',
+    'crc_errors': 'switch_port_crc_errors_total',
+    'input_errors': 'switch_port_input_errors_total',
+    'output_errors': 'switch_port_output_errors_total',
+    'drops': 'switch_port_drops_total',
+}
+CPU_WINDOWS = (('five_seconds', '5s'), ('one_minute', '1m'), ('five_minutes', '5m'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _system_samples(switch, data):
+    samples = {}
+    cpu = data.get('cpu') or {}
+    samples['switch_cpu_utilization_percent'] = [
+        f"switch_cpu_utilization_percent{_labels(switch=switch, window=window)} {cpu[key]}\n"
+        for key, window in CPU_WINDOWS if cpu.get(key) is not None]
+    power = data.get('power') or {}
+    for field in ('nominal_watts', 'consumed_watts'):
+        if power.get(field) is not None:
+            samples[f'switch_poe_{field}'] = [f"switch_poe_{field}{_labels(switch=switch)} {power[field]}\n"]
+    return samples
+
+def _interface_samples(switch, data):
+    samples = {family: [] for family in PORT_COUNTERS.values()}
+    samples['switch_port_link_up'] = []
+    for port in data.get('ports') or ():
+        labels = _labels(switch=switch, port=port['port'])
+        if port.get('link_state') is not None:
+            samples['switch_port_link_up'].append(
+                f"switch_port_link_up{labels} {1 if port['link_state'] == 'up' else 0}\n")
+        for field, family in PORT_COUNTERS.items():
+            if port.get(field) is not None:
+                samples[family].append(f"{family}{labels} {port[field]}\n")
+    samples['switch_port_link_flaps'] = [
+        f"switch_port_link_flaps{_labels(switch=switch, port=port)} {entry['flaps']}\n"
+        for port, entry in (data.get('flaps') or {}).items()]
+    return samples
+
+
+class PrometheusExporter:
+    """
+    Renders the snapshot cache in the Prometheus text exposition format.
+
+    Each (switch, collector) snapshot is turned into per-family text
+    fragments once, when it is collected, and reused on every scrape until
+    the next collection replaces it; an unchanged cache returns the
+    previously joined body. Scrapes never touch the switches.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._fragments = {}   # (host_id, kind) -> (collected_at, {family: text})
+        self._body = None
+        self._body_key = None
+
+    def render(self):
+        entries = self.cache.items()
+        key = tuple(sorted((host_id, kind, collected_at) for host_id, kind, collected_at, _ in entries))
+        with self._lock:
+            if key == self._body_key:
+                return self._body
+            live = set()
+            for host_id, kind, collected_at, data in entries:
+                live.add((host_id, kind))
+                cached = self._fragments.get((host_id, kind))
+                if cached is None or cached[0] != collected_at:
+                    self._fragments[(host_id, kind)] = (collected_at, self._build(host_id, kind, collected_at, data))
+            for stale in set(self._fragments) - live:
+                del self._fragments[stale]
+
+            fragments = [self._fragments[name][1] for name in sorted(self._fragments)]
+            parts = []
+            for family, (metric_type, help_text) in METRIC_FAMILIES.items():
+                chunks = [fragment[family] for fragment in fragments if fragment.get(family)]
+                if not chunks:
+                    continue
+                parts.append(f"# HELP {family} {help_text}\n# TYPE {family} {metric_type}\n")
+                parts.extend(chunks)
+            self._body = ''.join(parts)
+            self._body_key = key
+            return self._body
+
+    def _build(self, host_id, kind, collected_at, data):
+        if kind == 'system':
+            samples = _system_samples(host_id, data)
+        elif kind == 'interface':
+            samples = _interface_samples(host_id, data)
+        else:
+            samples = {}
+        labels = _labels(switch=host_id, collector=kind)
+        if data.get('collection_seconds') is not None:
+            samples['switch_collection_duration_seconds'] = [
+                f"switch_collection_duration_seconds{labels} {data['collection_seconds']}\n"]
+        samples['switch_last_collection_timestamp_seconds'] = [
+            f"switch_last_collection_timestamp_seconds{labels} {collected_at:.3f}\n"]
+        return {family: ''.join(lines) for family, lines in samples.items() if lines}
@@ -0,0 +1,376 @@
+import re
+from instrumentation import timed
+
+# Long interface names and the short form used as the canonical port key
+PORT_PREFIXES = [
+    ('tengigabitethernet', 'te'),
+    ('gigabitethernet', 'gi'),
+    ('fastethernet', 'fa'),
+    ('port-channel', 'po'),
+    ('ethernet', 'eth'),
+]
+PORT_NAME = re.compile(r'^(?:te|gi|fa|po|eth|tengigabitethernet|gigabitethernet|fastethernet|port-channel|ethernet)'
+                       r'\d+(?:/\d+)*$', re.IGNORECASE)
+SEPARATOR_LINE = re.compile(r'^\s*-{2,}(?:\s+-{2,})*\s*$')
+
+# Counter table headers (lower-cased, spaces removed) -> PortRecord field
+COUNTER_COLUMNS = {
+    'inucastpkts': 'in_ucast_pkts',
+    'inmcastpkts': 'in_mcast_pkts',
+    'inbcastpkts': 'in_bcast_pkts',
+    'inoctets': 'in_octets',
+    'outucastpkts': 'out_ucast_pkts',
+    'outmcastpkts': 'out_mcast_pkts',
+    'outbcastpkts': 'out_bcast_pkts',
+    'outoctets': 'out_octets',
+    # 'show interfaces counters errors' (IOS)
+    'fcs-err': 'crc_errors',
+    'rcv-err': 'input_errors',
+    'xmit-err': 'output_errors',
+    'outdiscards': 'drops',
+}
+
+# "Key: value" error lines in per-port counter output -> PortRecord field
+COUNTER_ERROR_LINES = {
+    'fcs errors': 'crc_errors',
+    'crc errors': 'crc_errors',
+    'late collisions': 'late_collisions',
+    'excessive collisions': 'excessive_collisions',
+    'oversize packets': 'oversize_packets',
+    'internal mac rx errors': 'input_errors',
+    'internal mac tx errors': 'output_errors',
+}
+
+CPU_PATTERN = re.compile(r'five seconds:\s*(\d+)%.*?one minute:\s*(\d+)%.*?five minutes:\s*(\d+)%',
+                         re.IGNORECASE | re.DOTALL)
+INTERFACE_HEADER = re.compile(r'^(\S+) is (up|down|administratively down)', re.IGNORECASE)
+INTERFACE_COUNTERS = [
+    (re.compile(r'(\d+) packets input, (\d+) bytes'), ('in_packets', 'in_octets')),
+    (re.compile(r'(\d+) packets output, (\d+) bytes'), ('out_packets', 'out_octets')),
+    (re.compile(r'(\d+) input errors?, (\d+) CRC'), ('input_errors', 'crc_errors')),
+    (re.compile(r'(\d+) output errors?'), ('output_errors',)),
+    (re.compile(r'Total output drops:\s*(\d+)'), ('drops',)),
+    (re.compile(r'(\d+) interface resets'), ('interface_resets',)),
+]
+# "1    SF350-48P  370  24.5(6%)   95" / "1     On     370 Watts   24 Watts (6%)  95"
+POWER_UNIT_ROW = re.compile(r'^\s*(\d+)\s+\S+\s+(\d.*)$')
+DUPLEX_SPEED = re.compile(r'(Full|Half|Auto)-duplex,\s*([\w-]+?)(?:Mb/s|Mbps|Gb/s)?(?:,|$)', re.IGNORECASE)
+# "Agreed Voice VLAN-ID is 100" (auto mode) / "Best Local Voice VLAN-ID is 100" / "Voice VLAN ID: 100"
+VOICE_VLAN_PATTERNS = [
+    re.compile(r'Agreed Voice VLAN-ID is (\d+)', re.IGNORECASE),
+    re.compile(r'Best Local Voice VLAN-ID is (\d+)', re.IGNORECASE),
+    re.compile(r'Voice VLAN[- ]ID\s*:\s*(\d+)', re.IGNORECASE),
+]
+
+
+class PortRecord:
+    """
+    Health of one switch port. Fields a command did not report stay None.
+    """
+    __slots__ = ('port', 'port_type', 'link_state', 'speed', 'duplex', 'vlan',
+                 'in_octets', 'out_octets', 'in_packets', 'out_packets',
+                 'in_ucast_pkts', 'in_mcast_pkts', 'in_bcast_pkts',
+                 'out_ucast_pkts', 'out_mcast_pkts', 'out_bcast_pkts',
+                 'crc_errors', 'input_errors', 'output_errors', 'drops',
+                 'late_collisions', 'excessive_collisions', 'oversize_packets',
+                 'interface_resets')
+
+    def __init__(self, port):
+        for field in self.__slots__:
+            setattr(self, field, None)
+        self.port = port
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"PortRecord({self.port!r}, link_state={self.link_state!r})"
+
+
+def normalize_port(name):
+    """
+    Canonical short port name: 'GigabitEthernet1/0/1' and 'Gi1/0/1' -> 'gi1/0/1'.
+    """
+    lowered = name.strip().lower()
+    for long_name, short_name in PORT_PREFIXES:
+        if lowered.startswith(long_name):
+            return short_name + lowered[len(long_name):]
+    return lowered
+
+def is_port_name(token):
+    return bool(PORT_NAME.match(token.strip()))
+
+def port_sort_key(port):
+    """
+    Natural sort key so that gi1/0/2 sorts before gi1/0/10.
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', port)]
+
+def _to_int(value):
+    value = value.strip().replace(',', '')
+    return int(value) if value.isdigit() else None
+
+def _column_spans(separator):
+    return [(m.start(), m.end()) for m in re.finditer(r'-+', separator)]
+
+def _split_row(line, spans):
+    """
+    Cut a table row into one value per column. Rows whose whitespace tokens
+    line up with the columns are split on whitespace; otherwise the dash
+    spans are used, moving each cut to the next blank so values that
+    overflow their column stay whole.
+    """
+    tokens = line.split()
+    if len(tokens) == len(spans):
+        return tokens
+    values = []
+    start = 0
+    for index in range(len(spans)):
+        if index + 1 < len(spans):
+            end = spans[index + 1][0]
+            while 0 < end < len(line) and not line[end - 1].isspace() and not line[end].isspace():
+                end += 1
+        else:
+            end = len(line)
+        values.append(line[start:end].strip())
+        start = end
+    return values
+
+def parse_table(text):
+    """
+    Parse every dash-underlined table in text.
+
+    Returns a list of tables, each a list of row dicts keyed by the column
+    header (multi-line headers are joined with a space).
+    """
+    lines = text.splitlines()
+    tables = []
+    index = 0
+    while index < len(lines):
+        if not SEPARATOR_LINE.match(lines[index]):
+            index += 1
+            continue
+        spans = _column_spans(lines[index])
+        header_lines = []
+        back = index - 1
+        while back >= 0 and lines[back].strip() and not SEPARATOR_LINE.match(lines[back]) and len(header_lines) < 3:
+            header_lines.insert(0, lines[back])
+            back -= 1
+        header_cells = [_split_row(header, spans) for header in header_lines]
+        headers = [' '.join(cells[column] for cells in header_cells if cells[column])
+                   for column in range(len(spans))]
+        rows = []
+        index += 1
+        while index < len(lines) and lines[index].strip() and not SEPARATOR_LINE.match(lines[index]):
+            # A following table's header ends this one
+            if index + 1 < len(lines) and SEPARATOR_LINE.match(lines[index + 1]):
+                break
+            rows.append(dict(zip(headers, _split_row(lines[index], spans))))
+            index += 1
+        tables.append(rows)
+    return tables
+
+def _port_column(row):
+    for key in ('Port', 'Interface', 'Port Name'):
+        if key in row:
+            return row[key]
+    return None
+
+def _get_record(records, port):
+    port = normalize_port(port)
+    record = records.get(port)
+    if record is None:
+        record = records[port] = PortRecord(port)
+    return record
+
+@timed('parse')
+def parse_interface_status(text, records=None):
+    """
+    Parse 'show interface(s) status' into {port: PortRecord} with type,
+    duplex, speed and link state.
+    """
+    records = {} if records is None else records
+    for table in parse_table(text):
+        for row in table:
+            port = _port_column(row)
+            if not port or not is_port_name(port):
+                continue
+            record = _get_record(records, port)
+            for header, value in row.items():
+                key = header.lower()
+                if value in ('', '--'):
+                    continue
+                if key == 'type':
+                    record.port_type = value
+                elif key == 'duplex':
+                    record.duplex = value.lower()
+                elif key == 'speed':
+                    record.speed = value
+                elif key in ('link state', 'status'):
+                    record.link_state = value.lower()
+                elif key == 'vlan':
+                    record.vlan = value
+    return records
+
+@timed('parse')
+def parse_interfaces(text, records=None):
+    """
+    Parse the per-interface blocks of 'show interfaces' (link state,
+    duplex/speed, packet/byte counters, input/CRC/output errors, drops).
+    """
+    records = {} if records is None else records
+    record = None
+    for line in text.splitlines():
+        header = INTERFACE_HEADER.match(line)
+        if header:
+            record = _get_record(records, header.group(1))
+            record.link_state = 'down' if 'down' in header.group(2).lower() else 'up'
+            continue
+        if record is None:
+            continue
+        duplex_speed = DUPLEX_SPEED.search(line)
+        if duplex_speed:
+            record.duplex = duplex_speed.group(1).lower()
+            speed = duplex_speed.group(2)
+            if speed.lower() not in ('auto-speed', 'auto'):
+                record.speed = speed
+        for pattern, fields in INTERFACE_COUNTERS:
+            match = pattern.search(line)
+            if match:
+                for field, value in zip(fields, match.groups()):
+                    setattr(record, field, int(value))
+    return records
+
+@timed('parse')
+def parse_interface_counters(text, records=None):
+    """
+    Parse 'show interfaces counters [port]' tables and per-port error lines.
+
+    Error lines ("FCS Errors: 0") are attributed to the most recent
+    'Port: x' line, or to the only port in the tables.
+    """
+    records = {} if records is None else records
+    seen = []
+    for table in parse_table(text):
+        for row in table:
+            port = _port_column(row)
+            if not port or not is_port_name(port):
+                continue
+            record = _get_record(records, port)
+            if record.port not in seen:
+                seen.append(record.port)
+            for header, value in row.items():
+                field = COUNTER_COLUMNS.get(header.lower().replace(' ', ''))
+                if field:
+                    setattr(record, field, _to_int(value))
+
+    current = records[seen[0]] if len(seen) == 1 else None
+    for line in text.splitlines():
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key = key.strip().lower()
+        if key in ('port', 'interface') and is_port_name(value):
+            current = _get_record(records, value.strip())
+            continue
+        field = COUNTER_ERROR_LINES.get(key)
+        if field and current is not None:
+            setattr(current, field, _to_int(value))
+    return records
+
+@timed('parse')
+def parse_queue_statistics(text, records=None):
+    """
+    Parse 'show queue statistics'; every column whose header mentions drops
+    is summed into the port's drops counter.
+    """
+    records = {} if records is None else records
+    totals = {}
+    for table in parse_table(text):
+        for row in table:
+            port = _port_column(row)
+            if not port or not is_port_name(port):
+                continue
+            dropped = [_to_int(value) for header, value in row.items() if 'drop' in header.lower()]
+            dropped = [value for value in dropped if value is not None]
+            if dropped:
+                key = normalize_port(port)
+                totals[key] = totals.get(key, 0) + sum(dropped)
+    for port, drops in totals.items():
+        _get_record(records, port).drops = drops
+    return records
+
+@timed('parse')
+def parse_cpu_utilization(text):
+    """
+    Parse 'show cpu utilization' into percentages, or None if not found.
+    """
+    match = CPU_PATTERN.search(text or '')
+    if not match:
+        return None
+    return {
+        'five_seconds': int(match.group(1)),
+        'one_minute': int(match.group(2)),
+        'five_minutes': int(match.group(3))
+    }
+
+@timed('parse')
+def parse_power_inline(text):
+    """
+    Parse the per-unit rows of 'show power inline' into total nominal and
+    consumed PoE power in watts, or None if no unit rows were found.
+    """
+    nominal = consumed = 0.0
+    units = 0
+    for line in (text or '').splitlines():
+        match = POWER_UNIT_ROW.match(line)
+        if not match:
+            continue
+        # Drop "(6%)" style usage figures before picking out the wattages
+        values = re.findall(r'\d+(?:\.\d+)?', re.sub(r'\([^)]*\)', '', match.group(2)))
+        if len(values) < 2:
+            continue
+        nominal += float(values[0])
+        consumed += float(values[1])
+        units += 1
+    if not units:
+        return None
+    return {'units': units, 'nominal_watts': nominal, 'consumed_watts': consumed}
+
+@timed('parse')
+def parse_voice_vlan(text):
+    """
+    Voice VLAN id from 'show voice vlan', or None if disabled or not found.
+    """
+    if re.search(r'Voice VLAN state is disabled', text or '', re.IGNORECASE):
+        return None
+    for pattern in VOICE_VLAN_PATTERNS:
+        match = pattern.search(text or '')
+        if match:
+            return match.group(1)
+    return None
+
+@timed('merge')
+def build_port_records(status_text='', interfaces_text='', counters_texts=(), queue_text=''):
+    """
+    Merge the outputs of the interface commands into one {port: PortRecord}.
+
+    Status output is applied last so that its link state and speed/duplex
+    take precedence over what 'show interfaces' reported.
+    """
+    records = {}
+    if interfaces_text:
+        parse_interfaces(interfaces_text, records)
+    for counters_text in counters_texts:
+        parse_interface_counters(counters_text, records)
+    if queue_text:
+        parse_queue_statistics(queue_text, records)
+    if status_text:
+        parse_interface_status(status_text, records)
+    return records
+
+def ports_to_json(records):
+    """
+    Port records as a list of dicts in natural port order.
+    """
+    return [records[port].to_dict() for port in sorted(records, key=port_sort_key)]
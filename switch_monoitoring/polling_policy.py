@@ -0,0 +1,200 @@
+import re
+import threading
+import time
+from sshconnect import logger  # Import from sshconnect.py
+
+# How often each command is re-run: 'fast' on every poll, slower tiers
+# only once their cached output is older than TIER_MAX_AGE
+COMMAND_TIERS = {
+    'show version': 'static',
+    'show inventory': 'static',
+    'show voice vlan': 'static',
+    'show log': 'normal',
+    # Slowest command; link state and traffic still come from the status and
+    # counters tables on every poll, and boosted switches refresh it each time
+    'show interfaces': 'normal',
+}
+TIER_MAX_AGE = {
+    'fast': 0,
+    'normal': 900,
+    'static': 86400,
+}
+
+BOOST_INTERVAL = 60         # Poll interval while a switch is boosted
+BOOST_DURATION = 900        # Seconds a change keeps a switch boosted
+QUIET_PERIOD = 3600         # Seconds without changes before a switch is polled less often
+RELAX_FACTOR = 2            # Interval multiplier for quiet switches
+CPU_BOOST_PERCENT = 80      # Five-second CPU load that counts as a change
+
+# "System Up Time (days,hour:min:sec):        12,03:04:05" (Cisco SB)
+UPTIME_PATTERN = re.compile(r'Up\s*Time.*?:\s*(\d+),(\d+):(\d+):(\d+)', re.IGNORECASE)
+
+
+def command_tier(command):
+    """
+    Tier of a command; output filters ('show log | include ...') share the
+    tier of the command they filter.
+    """
+    return COMMAND_TIERS.get(command.split(' | ')[0].strip(), 'fast')
+
+def parse_uptime(text):
+    """
+    Uptime in seconds from 'show system' output, or None.
+    """
+    match = UPTIME_PATTERN.search(text or '')
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(value) for value in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def interface_change(previous_ports, ports, rates=None, flaps=None, since=None):
+    """
+    Why a switch's interfaces need closer watching, or None: a port whose
+    link state changed since the previous poll, a port over a rate
+    threshold, or a link flap logged after since.
+    """
+    previous = {port['port']: port.get('link_state') for port in previous_ports or ()}
+    for port in ports or ():
+        old = previous.get(port['port'])
+        if old is not None and port.get('link_state') not in (None, old):
+            return f"{port['port']} went {port['link_state']}"
+    for name, entry in ((rates or {}).get('ports') or {}).items():
+        flags = [flag for flag in entry.get('flags', ()) if not flag.endswith('_reset')]
+        if flags:
+            return f"{name} over {', '.join(flags)} threshold"
+    if since is not None:
+        for name, entry in (flaps or {}).items():
+            if entry.get('last_change') and entry['last_change'] > since:
+                return f"{name} flapped"
+    return None
+
+def system_change(cpu):
+    """
+    Why a switch's system health needs closer watching, or None.
+    """
+    load = (cpu or {}).get('five_seconds')
+    if load is not None and load >= CPU_BOOST_PERCENT:
+        return f"CPU at {load}%"
+    return None
+
+
+class PollingPolicy:
+    """
+    Decides per switch which commands to run on a poll and how soon to poll
+    again.
+
+    Slow-tier command output is cached per switch and reused until it ages
+    out, or at once if the switch rebooted (its uptime went backwards).
+    Switches with a recent change (link state, error rates, flaps, CPU) are
+    boosted: polled every BOOST_INTERVAL seconds with every command, for
+    BOOST_DURATION seconds. Switches quiet for QUIET_PERIOD are polled
+    RELAX_FACTOR times less often.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outputs = {}      # (host, command) -> (collected_at, output)
+        self._boosts = {}       # host -> (until, reason)
+        self._changed = {}      # host -> time of the last change
+        self._uptimes = {}      # host -> last uptime seconds
+
+    def plan(self, host, commands, now=None):
+        """
+        Split commands into (to run, {command: cached output to reuse}).
+        """
+        now = now or time.time()
+        boosted = self.boosted(host, now) is not None
+        run = []
+        reused = {}
+        with self._lock:
+            for command in commands:
+                max_age = TIER_MAX_AGE[command_tier(command)]
+                cached = self._outputs.get((host, command))
+                # Boosted switches refresh everything but static data
+                if boosted and max_age < TIER_MAX_AGE['static']:
+                    max_age = 0
+                if cached and max_age and now - cached[0] < max_age:
+                    reused[command] = cached[1]
+                else:
+                    run.append(command)
+        if reused:
+            logger.debug(f"{host}: reusing cached output of {sorted(reused)}")
+        return run, reused
+
+    def record(self, host, command, output, now=None):
+        """
+        Remember a command's output; a reboot seen in 'show system' drops
+        the cached static data.
+        """
+        now = now or time.time()
+        if command == 'show system':
+            uptime = parse_uptime(output)
+            with self._lock:
+                previous = self._uptimes.get(host)
+                if uptime is not None:
+                    self._uptimes[host] = uptime
+            if uptime is not None and previous is not None and uptime < previous:
+                logger.info(f"{host} rebooted, refreshing cached static data")
+                self.invalidate(host)
+                self.boost(host, 'reboot', now)
+        if command_tier(command) == 'fast' or output.startswith('Error:'):
+            return
+        with self._lock:
+            self._outputs[(host, command)] = (now, output)
+
+    def invalidate(self, host):
+        with self._lock:
+            for key in [key for key in self._outputs if key[0] == host]:
+                del self._outputs[key]
+
+    def boost(self, host, reason, now=None):
+        now = now or time.time()
+        with self._lock:
+            already = host in self._boosts and self._boosts[host][0] > now
+            self._boosts[host] = (now + BOOST_DURATION, reason)
+            self._changed[host] = now
+        if not already:
+            logger.info(f"Boosting polling of {host}: {reason}")
+
+    def boosted(self, host, now=None):
+        """
+        Reason the switch is boosted, or None.
+        """
+        now = now or time.time()
+        with self._lock:
+            boost = self._boosts.get(host)
+        return boost[1] if boost and boost[0] > now else None
+
+    def interval(self, host, base, now=None):
+        """
+        Seconds until the switch should be polled again, given its base interval.
+        """
+        now = now or time.time()
+        if self.boosted(host, now) is not None:
+            return min(base, BOOST_INTERVAL)
+        with self._lock:
+            changed = self._changed.setdefault(host, now)
+        if now - changed >= QUIET_PERIOD:
+            return base * RELAX_FACTOR
+        return base
+
+    def status(self, now=None):
+        """
+        {host: {'boosted', 'boosted_until', 'last_change', 'cached_commands'}} for the API.
+        """
+        now = now or time.time()
+        with self._lock:
+            hosts = set(self._changed) | {host for host, _ in self._outputs}
+            result = {}
+            for host in hosts:
+                until, reason = self._boosts.get(host, (0, None))
+                result[host] = {
+                    'boosted': reason if until > now else None,
+                    'boosted_until': until if until > now else None,
+                    'last_change': self._changed.get(host),
+                    'cached_commands': sorted(command for key_host, command in self._outputs if key_host == host)
+                }
+        return result
+
+
+# Shared by the Flask app's collectors and scheduler
+polling_policy = PollingPolicy()
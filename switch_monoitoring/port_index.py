@@ -0,0 +1,186 @@
+import heapq
+import threading
+import time
+from parsers import port_sort_key
+
+# Fields with an exact-match index; values are compared as lowercase strings
+INDEXED_FIELDS = ('switch', 'link_state', 'speed', 'duplex', 'vlan', 'voice_vlan', 'error_bucket')
+# Numeric fields usable as min_<field> filters and sort keys
+NUMERIC_FIELDS = ('crc_errors', 'input_errors', 'output_errors', 'drops', 'errors')
+# Upper bounds (exclusive) and labels of the error buckets, by total errors
+ERROR_BUCKETS = ((1, '0'), (10, '1-9'), (100, '10-99'), (1000, '100-999'), (None, '1000+'))
+DEFAULT_LIMIT = 100
+
+
+def error_bucket(errors):
+    for bound, label in ERROR_BUCKETS:
+        if bound is None or errors < bound:
+            return label
+
+def _key(value):
+    return None if value is None else str(value).lower()
+
+
+class PortIndex:
+    """
+    In-memory index of every collected port across the fleet.
+
+    Each port is one row (switch, port, link state, speed/duplex, VLAN,
+    switch voice VLAN, error counters and error bucket) with an exact-match
+    index per INDEXED_FIELDS value. Collections update a switch's rows in
+    place, touching only index entries whose value changed, and queries
+    intersect the matching index sets before filtering numerically, so
+    they never scan the whole fleet or contact a switch.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}         # (switch, port) -> row dict
+        self._switches = {}     # switch -> set of (switch, port)
+        self._voice_vlans = {}  # switch -> voice VLAN id
+        self._order = {}        # (switch, port) -> natural sort key, computed once per port
+        self._index = {field: {} for field in INDEXED_FIELDS}   # field -> value -> set of keys
+
+    def _row(self, switch, port, updated_at):
+        crc = port.get('crc_errors') or 0
+        errors = crc + (port.get('input_errors') or 0) + (port.get('output_errors') or 0)
+        return {
+            'switch': switch,
+            'port': port['port'],
+            'link_state': port.get('link_state'),
+            'speed': port.get('speed'),
+            'duplex': port.get('duplex'),
+            'vlan': port.get('vlan'),
+            'voice_vlan': self._voice_vlans.get(switch),
+            'crc_errors': port.get('crc_errors'),
+            'input_errors': port.get('input_errors'),
+            'output_errors': port.get('output_errors'),
+            'drops': port.get('drops'),
+            'errors': errors,
+            'error_bucket': error_bucket(errors),
+            'updated_at': updated_at
+        }
+
+    def _link(self, key, row):
+        for field in INDEXED_FIELDS:
+            value = _key(row[field])
+            if value is not None:
+                self._index[field].setdefault(value, set()).add(key)
+
+    def _unlink(self, key, row, fields=INDEXED_FIELDS):
+        for field in fields:
+            value = _key(row[field])
+            keys = self._index[field].get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[field][value]
+
+    def update_switch(self, switch, ports, updated_at=None):
+        """
+        Replace a switch's rows with its latest port list (dicts as from
+        ports_to_json). Ports no longer reported are dropped.
+        """
+        updated_at = updated_at or time.time()
+        with self._lock:
+            current = set()
+            for port in ports:
+                key = (switch, port['port'])
+                current.add(key)
+                row = self._row(switch, port, updated_at)
+                old = self._rows.get(key)
+                if old is None:
+                    self._link(key, row)
+                    self._order[key] = (switch, port_sort_key(port['port']))
+                else:
+                    changed = [field for field in INDEXED_FIELDS if _key(old[field]) != _key(row[field])]
+                    if changed:
+                        self._unlink(key, old, changed)
+                        for field in changed:
+                            value = _key(row[field])
+                            if value is not None:
+                                self._index[field].setdefault(value, set()).add(key)
+                self._rows[key] = row
+            for key in self._switches.get(switch, set()) - current:
+                self._unlink(key, self._rows.pop(key))
+                del self._order[key]
+            self._switches[switch] = current
+
+    def set_voice_vlan(self, switch, vlan):
+        """
+        Record a switch's voice VLAN (from 'show voice vlan') on all its ports.
+        """
+        with self._lock:
+            if self._voice_vlans.get(switch) == vlan:
+                return
+            self._voice_vlans[switch] = vlan
+            for key in self._switches.get(switch, ()):
+                row = self._rows[key]
+                self._unlink(key, row, ('voice_vlan',))
+                row['voice_vlan'] = vlan
+                if vlan is not None:
+                    self._index['voice_vlan'].setdefault(_key(vlan), set()).add(key)
+
+    def remove_switch(self, switch):
+        with self._lock:
+            for key in self._switches.pop(switch, set()):
+                self._unlink(key, self._rows.pop(key))
+                del self._order[key]
+            self._voice_vlans.pop(switch, None)
+
+    def query(self, filters=None, minimums=None, sort=None, descending=True, limit=DEFAULT_LIMIT):
+        """
+        Rows matching every filter, sorted and cut to limit.
+
+        filters maps an INDEXED_FIELDS name to a value or a list of
+        accepted values; 'vlan' is the port's own VLAN and 'voice_vlan'
+        the switch's voice VLAN, matched separately.
+        minimums maps a NUMERIC_FIELDS name to its lowest accepted value.
+        Returns (total matches, [row, ...]).
+        """
+        filters = filters or {}
+        minimums = minimums or {}
+        with self._lock:
+            candidates = None
+            for field, wanted in sorted(filters.items(), key=lambda item: item[0] != 'switch'):
+                values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+                matched = set()
+                for value in values:
+                    matched |= self._index[field].get(_key(value), set())
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return 0, []
+            rows = self._rows.values() if candidates is None else [self._rows[key] for key in candidates]
+            if minimums:
+                rows = [row for row in rows
+                        if all((row[field] or 0) >= minimum for field, minimum in minimums.items())]
+            total = len(rows)
+            if sort:
+                # Ports that did not report the field sort last either way
+                if sort in NUMERIC_FIELDS:
+                    missing = -1 if descending else float('inf')
+                    sort_key = lambda row: row[sort] if row[sort] is not None else missing
+                else:
+                    sort_key = lambda row: str(row[sort] or '')
+                if limit and descending:
+                    rows = heapq.nlargest(limit, rows, key=sort_key)
+                elif limit:
+                    rows = heapq.nsmallest(limit, rows, key=sort_key)
+                else:
+                    rows = sorted(rows, key=sort_key, reverse=descending)
+            else:
+                order = lambda row: self._order[(row['switch'], row['port'])]
+                rows = heapq.nsmallest(limit, rows, key=order) if limit else sorted(rows, key=order)
+            if limit:
+                rows = rows[:limit]
+            return total, [dict(row) for row in rows]
+
+    def facets(self):
+        """
+        Port counts per value of every indexed field except switch.
+        """
+        with self._lock:
+            return {field: {value: len(keys) for value, keys in self._index[field].items()}
+                    for field in INDEXED_FIELDS if field != 'switch'}
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,199 @@
+import math
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Optional: fall back to plain Python lists
+    np = None
+
+# Cumulative counters turned into per-second rates
+RATE_COUNTERS = ('in_octets', 'out_octets', 'crc_errors', 'input_errors', 'output_errors', 'drops')
+
+# Per-second rates above which a port is flagged
+RATE_THRESHOLDS = {
+    'crc_errors': 0.01,
+    'input_errors': 0.1,
+    'output_errors': 0.1,
+    'drops': 1.0,
+}
+
+COUNTER_WRAP_32 = 2 ** 32
+# A decrease counts as a 32-bit wrap only if the previous value was within this
+# distance below 2^32 and the new one is within it above zero; any other decrease is a reset
+WRAP_MARGIN = 2 ** 28
+
+
+def columns_from_ports(ports):
+    """
+    Turn a list of port dicts (see parsers.ports_to_json) into column form:
+    (port names, {counter: list of floats}), with NaN for missing values.
+    """
+    names = [port['port'] for port in ports]
+    columns = {}
+    for counter in RATE_COUNTERS:
+        columns[counter] = [float(port[counter]) if port.get(counter) is not None else math.nan
+                            for port in ports]
+    return names, columns
+
+
+def _deltas_numpy(current, previous, elapsed):
+    current = np.asarray(current, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.float64)
+    elapsed = np.asarray(elapsed, dtype=np.float64)
+    delta = current - previous
+    negative = delta < 0
+    # A 32-bit counter that rolled over: previous was just below 2^32 and current is just above 0
+    wrapped = (negative & (previous >= COUNTER_WRAP_32 - WRAP_MARGIN) & (previous < COUNTER_WRAP_32)
+               & (current < WRAP_MARGIN))
+    delta = np.where(wrapped, delta + COUNTER_WRAP_32, delta)
+    reset = negative & ~wrapped
+    delta = np.where(reset, np.nan, delta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(elapsed > 0, delta / elapsed, np.nan)
+    return rate.tolist(), reset.tolist()
+
+
+def _deltas_python(current, previous, elapsed):
+    rates = []
+    resets = []
+    for cur, prev, dt in zip(current, previous, elapsed):
+        delta = cur - prev
+        reset = False
+        if delta < 0:
+            if COUNTER_WRAP_32 - WRAP_MARGIN <= prev < COUNTER_WRAP_32 and cur < WRAP_MARGIN:
+                delta += COUNTER_WRAP_32
+            else:
+                reset = True
+                delta = math.nan
+        rates.append(delta / dt if dt > 0 else math.nan)
+        resets.append(reset)
+    return rates, resets
+
+
+def compute_deltas(current, previous, elapsed):
+    """
+    Per-second rates for aligned columns of current/previous counter values
+    and elapsed seconds, handling 32-bit wraps. Counters that went backwards
+    without wrapping were reset: their rate is NaN and their reset flag set.
+    """
+    if np is not None:
+        return _deltas_numpy(current, previous, elapsed)
+    return _deltas_python(current, previous, elapsed)
+
+
+def _clean(value):
+    return None if value is None or math.isnan(value) else round(value, 4)
+
+
+class RateEngine:
+    """
+    Keeps the previous counter sample per switch and port and turns each new
+    sample into per-second rates, flagged against RATE_THRESHOLDS.
+
+    A counter missing from a sample (None) gets no rate; its last value and
+    time are kept, so the next sample that has it is differenced over the
+    whole gap instead of reporting the backlog as one spike.
+    """
+    def __init__(self, thresholds=None):
+        self.thresholds = dict(RATE_THRESHOLDS if thresholds is None else thresholds)
+        self._lock = threading.Lock()
+        self._previous = {}   # switch -> (timestamp, {port: {counter: (value, sampled at)}})
+        self._latest = {}     # switch -> rates result
+
+    def update(self, switch, ports, timestamp=None):
+        """
+        Feed one switch's port list and return its rates.
+        """
+        return self.update_many([(switch, ports, timestamp)])[switch]
+
+    def update_many(self, samples):
+        """
+        Feed (switch, ports, timestamp) samples for many switches at once.
+
+        Every counter of every port in the batch is differenced in one pass
+        over flat columns (vectorised when numpy is installed); gathering
+        the columns and building the per-port results are plain loops.
+        Returns {switch: {'interval': s, 'ports': {...}}}.
+        """
+        now = time.time()
+        layout = []          # (switch, timestamp, names, has_previous, elapsed)
+        current = {counter: [] for counter in RATE_COUNTERS}
+        previous = {counter: [] for counter in RATE_COUNTERS}
+        elapsed = {counter: [] for counter in RATE_COUNTERS}
+        new_state = {}
+
+        with self._lock:
+            for switch, ports, timestamp in samples:
+                timestamp = timestamp or now
+                names, columns = columns_from_ports(ports)
+                prev_time, prev_values = self._previous.get(switch, (None, {}))
+                dt = timestamp - prev_time if prev_time is not None else 0.0
+                layout.append((switch, timestamp, names, prev_time is not None, dt))
+                state = {}
+                for index, name in enumerate(names):
+                    prev_port = prev_values.get(name, {})
+                    port_state = state[name] = {}
+                    for counter in RATE_COUNTERS:
+                        value = columns[counter][index]
+                        prev_value, prev_at = prev_port.get(counter, (math.nan, None))
+                        current[counter].append(value)
+                        previous[counter].append(prev_value)
+                        elapsed[counter].append(timestamp - prev_at if prev_at is not None else 0.0)
+                        port_state[counter] = (prev_value, prev_at) if math.isnan(value) else (value, timestamp)
+                new_state[switch] = (timestamp, state)
+
+            computed = {counter: compute_deltas(current[counter], previous[counter], elapsed[counter])
+                        for counter in RATE_COUNTERS}
+
+            results = {}
+            offset = 0
+            for switch, timestamp, names, has_previous, dt in layout:
+                port_rates = {}
+                for index, name in enumerate(names):
+                    position = offset + index
+                    entry = {}
+                    flags = []
+                    for counter in RATE_COUNTERS:
+                        rates, resets = computed[counter]
+                        rate = _clean(rates[position])
+                        entry[f"{counter}_rate"] = rate
+                        if resets[position]:
+                            flags.append(f"{counter}_reset")
+                        limit = self.thresholds.get(counter)
+                        if rate is not None and limit is not None and rate > limit:
+                            flags.append(counter)
+                    entry['flags'] = flags
+                    port_rates[name] = entry
+                offset += len(names)
+                results[switch] = {
+                    'timestamp': timestamp,
+                    'interval': round(dt, 3) if has_previous else None,
+                    'ports': port_rates
+                }
+            self._previous.update(new_state)
+            self._latest.update(results)
+        return results
+
+    def set_latest(self, switch, rates):
+        """
+        Record rates computed elsewhere (a cluster worker's push) as the
+        switch's latest.
+        """
+        with self._lock:
+            self._latest[switch] = rates
+
+    def latest(self, switch):
+        with self._lock:
+            return self._latest.get(switch)
+
+    def flagged(self):
+        """
+        All ports currently over a threshold, as (switch, port, rates) tuples.
+        """
+        with self._lock:
+            latest = list(self._latest.items())
+        return [(switch, port, entry)
+                for switch, result in latest
+                for port, entry in result['ports'].items()
+                if any(not flag.endswith('_reset') for flag in entry['flags'])]
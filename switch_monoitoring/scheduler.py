@@ -0,0 +1,162 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sshconnect import logger  # Import from sshconnect.py
+from single_flight import SingleFlight
+
+DEFAULT_INTERVAL = 300      # Seconds between collections of one switch
+STARTUP_SPREAD = 60         # Initial collections are staggered over this many seconds
+MAX_WORKERS = 8             # Collections running at the same time
+
+
+class CollectionScheduler:
+    """
+    Collect every switch on its own interval in the background and store the
+    result in a SnapshotCache, so that viewers never trigger SSH themselves.
+
+    jobs maps a collector kind (e.g. 'system') to a function
+    (host_id, host_info) -> data. hosts_fn returns the current inventory as
+    {host_id: host_info}; a host_info 'interval' key overrides the default.
+    If given, interval_fn(host_info, kind, interval) adjusts the delay before
+    the next collection after each run (see PollingPolicy.interval), and
+    store_fn(host_id, kind, data) stores each result instead of cache.put
+    (e.g. to also record history, or to push it to a cluster coordinator).
+    The housekeeping callables run on the scheduler thread once a minute,
+    off the request path (e.g. HistoryStore.maybe_maintain).
+    """
+    def __init__(self, jobs, hosts_fn, cache, interval=DEFAULT_INTERVAL, max_workers=MAX_WORKERS,
+                 interval_fn=None, store_fn=None, housekeeping=()):
+        self.jobs = jobs
+        self.hosts_fn = hosts_fn
+        self.cache = cache
+        self.interval = interval
+        self.interval_fn = interval_fn
+        self.store_fn = store_fn or cache.put
+        self.housekeeping = housekeeping
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self._queue = []            # heap of (due, host_id, kind)
+        self._scheduled = set()     # (host_id, kind) present in the heap
+        self._running = set()       # (host_id, kind) currently collecting
+        self._wakeup = threading.Condition()
+        self._stopped = False
+        self._sync_requested = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._sync_hosts(initial=True)
+        self._thread = threading.Thread(target=self._run, name="collection-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Collection scheduler started for {len(self._scheduled)} jobs")
+
+    def stop(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def sync_now(self):
+        """
+        Re-read hosts_fn right away instead of within the next minute.
+        """
+        with self._wakeup:
+            self._sync_requested = True
+            self._wakeup.notify_all()
+
+    def collect_now(self, host_id, kind, host_info, on_section=None):
+        """
+        Collect synchronously (used for ?force=1 and streaming), update the
+        cache and return the fresh data.
+
+        Concurrent requests for the same switch and kind, including the
+        scheduler's own, share one collection and its result (see
+        SingleFlight), so a switch never sees duplicate SSH sessions.
+        """
+        def collect(on_section):
+            data = self.jobs[kind](host_id, host_info, on_section=on_section)
+            self.store_fn(host_id, kind, data)
+            return data
+        return self._flights.do((host_id, kind), collect, on_section)
+
+    def interval_for(self, host_info, kind=None):
+        """
+        Seconds between collections of a switch, after interval_fn.
+        """
+        try:
+            interval = float(host_info.get('interval') or self.interval)
+        except ValueError:
+            interval = self.interval
+        if self.interval_fn and kind is not None:
+            try:
+                interval = self.interval_fn(host_info, kind, interval)
+            except Exception as e:
+                logger.error(f"Interval policy failed for {host_info.get('host')}: {e}")
+        return interval
+
+    def _sync_hosts(self, initial=False):
+        hosts = self.hosts_fn()
+        now = time.time()
+        keys = [(host_id, kind) for host_id in hosts for kind in self.jobs]
+        with self._wakeup:
+            for index, key in enumerate(keys):
+                if key in self._scheduled or key in self._running:
+                    continue
+                offset = STARTUP_SPREAD * index / max(len(keys), 1) if initial else 0
+                heapq.heappush(self._queue, (now + offset, key[0], key[1]))
+                self._scheduled.add(key)
+            self._wakeup.notify_all()
+        return hosts
+
+    def _run(self):
+        hosts = {}
+        next_sync = 0
+        while True:
+            with self._wakeup:
+                if self._stopped:
+                    return
+                now = time.time()
+                if not self._queue or self._queue[0][0] > now:
+                    timeout = self._queue[0][0] - now if self._queue else 5
+                    self._wakeup.wait(timeout=min(timeout, 5))
+                    due = None
+                else:
+                    due, host_id, kind = heapq.heappop(self._queue)
+                    self._scheduled.discard((host_id, kind))
+                sync_requested, self._sync_requested = self._sync_requested, False
+            if sync_requested or time.time() >= next_sync:
+                # Pick up inventory changes without restarting the app
+                try:
+                    hosts = self._sync_hosts()
+                except Exception as e:
+                    logger.error(f"Scheduler could not read inventory: {e}")
+                for task in self.housekeeping:
+                    try:
+                        task()
+                    except Exception as e:
+                        logger.error(f"Scheduler housekeeping failed: {e}")
+                next_sync = time.time() + 60
+            if due is None:
+                continue
+            if host_id not in hosts:
+                continue  # Removed from inventory
+            with self._wakeup:
+                self._running.add((host_id, kind))
+            self._executor.submit(self._collect, host_id, kind, hosts[host_id])
+
+    def _collect(self, host_id, kind, host_info):
+        start = time.time()
+        try:
+            self.collect_now(host_id, kind, host_info)
+            logger.info(f"Scheduled {kind} collection of {host_id} took {time.time() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Scheduled {kind} collection of {host_id} failed: {e}")
+        finally:
+            with self._wakeup:
+                self._running.discard((host_id, kind))
+                if not self._stopped:
+                    heapq.heappush(self._queue, (start + self.interval_for(host_info, kind), host_id, kind))
+                    self._scheduled.add((host_id, kind))
+                    self._wakeup.notify_all()
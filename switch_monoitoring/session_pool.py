@@ -0,0 +1,328 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from sshconnect import (ssh_connect, enter_enable_mode, disable_paging, extract_prompt, learn_prompt,
+                        send_command, logger, DEFAULT_PLATFORM)  # Import from sshconnect.py
+from instrumentation import instrumentation
+from host_health import host_health, tcp_reachable
+
+# Pool tuning
+MAX_SESSIONS_PER_HOST = 2      # Concurrent shells allowed against one switch
+IDLE_TIMEOUT = 300             # Seconds an unused session is kept open
+KEEPALIVE_INTERVAL = 30        # Seconds between SSH keepalive packets
+CONNECT_RETRIES = 1            # Extra connect attempts before giving up
+BORROW_TIMEOUT = 120           # Seconds to wait for a free slot on a busy host
+MAX_CHANNELS_PER_DEVICE = 4    # Shell channels open to one switch across all its sessions
+
+
+def prepare_shell(channel, username, password, platform=DEFAULT_PLATFORM, host=None):
+    """
+    Bring a fresh shell channel into enable mode with paging turned off.
+    Returns (prompt, paging_disabled).
+    """
+    with instrumentation.span('prompt', host=host):
+        login_prompt = learn_prompt(channel)
+    with instrumentation.span('enable', host=host):
+        output = enter_enable_mode(channel, username, password, prompt=login_prompt)
+    prompt = extract_prompt(output) or login_prompt
+    with instrumentation.span('paging', host=host):
+        return prompt, disable_paging(channel, platform, prompt=prompt)
+
+
+class PooledSession:
+    """
+    An authenticated, enable-mode shell channel with paging turned off,
+    kept open between polls.
+
+    send_commands() can open further shell channels on the same SSH
+    transport, as far as the per-switch channel budget allows, and run
+    independent commands on them in parallel. Extra channels stay open
+    with the session.
+    """
+    def __init__(self, host, username, ssh_client, channel, prompt=None, paging_disabled=False,
+                 platform=DEFAULT_PLATFORM, password=None, channel_slots=None):
+        self.host = host
+        self.username = username
+        self.ssh_client = ssh_client
+        self.channel = channel
+        self.prompt = prompt
+        self.paging_disabled = paging_disabled
+        self.platform = platform
+        self.password = password
+        self.channel_slots = channel_slots
+        self.extra_channels = []  # (channel, prompt) opened by send_commands
+        self.created = time.time()
+        self.last_used = self.created
+
+    @property
+    def key(self):
+        return (self.host, self.username)
+
+    def send_command(self, command, **kwargs):
+        """
+        Run a command on this session, returning as soon as its prompt reappears.
+        """
+        return send_command(self.channel, command, prompt=self.prompt, host=self.host, **kwargs)
+
+    def send_commands(self, commands, on_result=None, max_channels=MAX_CHANNELS_PER_DEVICE):
+        """
+        Run independent commands over up to max_channels shell channels at once.
+
+        Commands are taken in the given order by whichever channel is free,
+        so list the slow ones first. on_result(command, output) is called
+        from the worker thread as each command finishes. Returns
+        {command: output}; raises ValueError for a command listed twice,
+        whose results could not be told apart.
+        """
+        duplicates = sorted({command for command in commands if commands.count(command) > 1})
+        if duplicates:
+            raise ValueError(f"Commands listed more than once: {', '.join(duplicates)}")
+        pending = deque(commands)
+        results = {}
+        wanted = min(len(pending), max_channels) - 1
+        extra = list(self.extra_channels[:wanted])
+        while len(extra) < wanted and self._reserve_channel():
+            extra.append(None)  # Opened by its worker so the primary channel starts at once
+        if not extra:
+            for command in commands:
+                results[command] = self.send_command(command)
+                if on_result:
+                    on_result(command, results[command])
+            return results
+
+        lock = threading.Lock()
+
+        def worker(channel, prompt):
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    command = pending.popleft()
+                output = send_command(channel, command, prompt=prompt, host=self.host)
+                if channel.closed and channel is not self.channel:
+                    # Hand the command back to the channels still alive
+                    with lock:
+                        pending.appendleft(command)
+                    return
+                with lock:
+                    results[command] = output
+                if on_result:
+                    on_result(command, output)
+
+        def extra_worker(index):
+            entry = extra[index]
+            if entry is None:
+                entry = self._open_channel()
+                if entry is None:
+                    return
+                with lock:
+                    self.extra_channels.append(entry)
+            worker(*entry)
+
+        threads = [threading.Thread(target=extra_worker, args=(index,), name=f"{self.host}-channel-{index + 2}",
+                                    daemon=True) for index in range(len(extra))]
+        for thread in threads:
+            thread.start()
+        worker(self.channel, self.prompt)
+        for thread in threads:
+            thread.join()
+        worker(self.channel, self.prompt)  # Anything left by channels that died
+        for entry in [entry for entry in self.extra_channels if entry[0].closed]:
+            self.extra_channels.remove(entry)
+            self.channel_slots.release()
+        return results
+
+    def _reserve_channel(self):
+        return self.channel_slots is not None and self.channel_slots.acquire(blocking=False)
+
+    def _open_channel(self):
+        try:
+            channel = self.ssh_client.invoke_shell()
+            channel.settimeout(20)
+            try:
+                prompt, _ = prepare_shell(channel, self.username, self.password, self.platform, self.host)
+            except Exception:
+                # Left open it would count against the switch's session limit on every retry
+                channel.close()
+                raise
+            logger.debug(f"Opened extra shell channel to {self.host}")
+            return channel, prompt
+        except Exception as e:
+            logger.warning(f"Extra shell channel to {self.host} failed: {e}")
+            self.channel_slots.release()
+            return None
+
+    def is_alive(self):
+        transport = self.ssh_client.get_transport()
+        return (transport is not None and transport.is_active()
+                and not self.channel.closed)
+
+    def close(self):
+        try:
+            self.ssh_client.close()
+        except Exception as e:
+            logger.debug(f"Error closing SSH session to {self.host}: {e}")
+        for _ in self.extra_channels:
+            self.channel_slots.release()
+        self.extra_channels = []
+        logger.info(f"SSH connection to {self.host} closed.")
+
+
+class SessionPool:
+    """
+    Per-host pool of ready-to-use switch sessions.
+
+    Sessions are opened on demand, put back after use, kept alive with SSH
+    keepalives and closed once they sit idle longer than idle_timeout.
+    Dead sessions are dropped and transparently replaced on the next borrow.
+    Switches that keep failing to connect are skipped by the host_health
+    circuit breaker until their backoff expires.
+    """
+    def __init__(self, max_per_host=MAX_SESSIONS_PER_HOST, idle_timeout=IDLE_TIMEOUT,
+                 keepalive_interval=KEEPALIVE_INTERVAL, connect_retries=CONNECT_RETRIES):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.connect_retries = connect_retries
+        self._lock = threading.Lock()
+        self._idle = {}    # (host, username) -> deque of PooledSession
+        self._slots = {}   # (host, username) -> BoundedSemaphore
+        self._channel_slots = {}  # host -> BoundedSemaphore for extra shell channels
+        self._reaper = None
+        self._reaper_stop = None   # Event that stops the current reaper
+
+    @contextmanager
+    def session(self, host_info, timeout=BORROW_TIMEOUT):
+        """
+        Borrow a session for host_info; it is returned to the pool on exit,
+        or discarded if the block raised or the connection died.
+        """
+        key = (host_info['host'], host_info['username'])
+        slot = self._slot(key)
+        if not slot.acquire(timeout=timeout):
+            raise TimeoutError(f"No free SSH session for {key[0]} after {timeout}s")
+        session = None
+        try:
+            session = self._checkout(host_info)
+            yield session
+        except Exception:
+            if session:
+                session.close()
+                session = None
+            raise
+        finally:
+            if session:
+                self._checkin(session)
+            slot.release()
+
+    def close_all(self):
+        """
+        Close every idle session and stop the idle reaper. The pool stays
+        usable; the next borrow starts a new reaper.
+        """
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+            stop, self._reaper_stop = self._reaper_stop, None
+            self._reaper = None
+        if stop is not None:
+            stop.set()
+        for session in sessions:
+            session.close()
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.max_per_host)
+            if self._reaper is None:
+                self._reaper_stop = threading.Event()
+                self._reaper = threading.Thread(target=self._reap_loop, args=(self._reaper_stop,),
+                                                name="ssh-pool-reaper", daemon=True)
+                self._reaper.start()
+            return self._slots[key]
+
+    def _channel_budget(self, host):
+        # Every session's primary channel is covered by max_per_host
+        with self._lock:
+            if host not in self._channel_slots:
+                extra = max(MAX_CHANNELS_PER_DEVICE - self.max_per_host, 0)
+                self._channel_slots[host] = threading.BoundedSemaphore(extra) if extra else None
+            return self._channel_slots[host]
+
+    def _checkout(self, host_info):
+        key = (host_info['host'], host_info['username'])
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                session = idle.pop() if idle else None
+            if session is None:
+                return self._open(host_info)
+            if session.is_alive():
+                logger.debug(f"Reusing pooled SSH session to {session.host}")
+                return session
+            logger.info(f"Discarding dead pooled session to {session.host}")
+            session.close()
+
+    def _checkin(self, session):
+        if not session.is_alive():
+            session.close()
+            return
+        session.last_used = time.time()
+        with self._lock:
+            self._idle.setdefault(session.key, deque()).append(session)
+
+    def _open(self, host_info):
+        host = host_info['host']
+        username = host_info['username']
+        password = host_info['password']
+        host_health.check(host)
+        # A closed port or a dead host fails here in milliseconds instead of a 15s handshake timeout
+        reachable, reason = tcp_reachable(host, host_info.get('port'))
+        if not reachable:
+            host_health.record_failure(host, reason)
+            raise ConnectionError(f"Failed to establish SSH connection to {host}: {reason}")
+        for attempt in range(self.connect_retries + 1):
+            ssh_client, channel = ssh_connect(host, username, password, host_info.get('port'))
+            if ssh_client and channel:
+                try:
+                    ssh_client.get_transport().set_keepalive(self.keepalive_interval)
+                    platform = host_info.get('platform') or DEFAULT_PLATFORM
+                    prompt, paging_disabled = prepare_shell(channel, username, password, platform, host)
+                    host_health.record_success(host)
+                    return PooledSession(host, username, ssh_client, channel, prompt, paging_disabled, platform,
+                                         password=password, channel_slots=self._channel_budget(host))
+                except Exception as e:
+                    logger.error(f"Session setup failed for {host}: {e}")
+                    ssh_client.close()
+            if attempt < self.connect_retries:
+                logger.info(f"Reconnecting to {host} (attempt {attempt + 2})")
+        host_health.record_failure(host, "SSH connect or login failed")
+        raise ConnectionError(f"Failed to establish SSH connection to {host}")
+
+    def _reap_loop(self, stop):
+        while not stop.wait(self.keepalive_interval):
+            self.evict_idle()
+
+    def evict_idle(self):
+        """
+        Close sessions that have been idle longer than idle_timeout.
+        """
+        cutoff = time.time() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                keep = deque()
+                for session in idle:
+                    if session.last_used < cutoff or not session.is_alive():
+                        expired.append(session)
+                    else:
+                        keep.append(session)
+                self._idle[key] = keep
+        for session in expired:
+            logger.info(f"Evicting idle SSH session to {session.host}")
+            session.close()
+
+
+# Shared pool used by the collector scripts
+session_pool = SessionPool()
@@ -0,0 +1,93 @@
+import threading
+import time
+from sshconnect import logger  # Import from sshconnect.py
+
+RESULT_WINDOW = 5       # Seconds a finished result is handed to follow-up callers
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'sections', 'listeners', 'finished_at', 'callers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.sections = []      # (title, output) reported so far, replayed to late joiners
+        self.listeners = []
+        self.finished_at = None
+        self.callers = 1
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls: while a call for a key is running,
+    further callers for the same key wait for it and share its result (or
+    exception) instead of starting their own. A successful result is also
+    handed out for window seconds after it finished.
+
+    The called function receives an on_section(title, output) callback;
+    every caller's own on_section gets all sections of the shared call,
+    including those reported before it joined.
+    """
+    def __init__(self, window=RESULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._flights = {}      # key -> _Flight, running or recently finished
+
+    def do(self, key, func, on_section=None):
+        """
+        Return func(on_section) for key, running it only if no call for key
+        is in flight or finished within the window.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.done.is_set() and time.time() - flight.finished_at > self.window:
+                flight = None
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.callers += 1
+                replay = list(flight.sections)
+                if on_section and not flight.done.is_set():
+                    flight.listeners.append(on_section)
+        if leader:
+            return self._lead(key, flight, func, on_section)
+
+        logger.info(f"Joining in-flight collection {key} ({flight.callers} callers)")
+        if on_section:
+            for title, output in replay:
+                on_section(title, output)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _lead(self, key, flight, func, on_section):
+        if on_section:
+            flight.listeners.append(on_section)
+
+        def fan_out(title, output):
+            with self._lock:
+                flight.sections.append((title, output))
+                listeners = list(flight.listeners)
+            for listener in listeners:
+                try:
+                    listener(title, output)
+                except Exception as e:
+                    logger.error(f"Section listener for {key} failed: {e}")
+
+        try:
+            flight.result = func(fan_out)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                flight.finished_at = time.time()
+                flight.listeners = []
+                if flight.error is not None and self._flights.get(key) is flight:
+                    # Failures are shared with waiting callers but never reused
+                    del self._flights[key]
+                flight.done.set()
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+
+SNAPSHOT_TTL = 600      # Seconds a collected snapshot is served before it is considered stale
+TTL_SLACK = 120         # Seconds a snapshot outlives its switch's poll interval (collection time, jitter)
+KEPT_VERSIONS = 8       # Previous snapshots kept per switch and kind for delta responses
+
+
+class SnapshotCache:
+    """
+    Latest collected result per (host id, collector kind), kept in memory.
+
+    Every put gets a new, cache-wide increasing version number, and the last
+    KEPT_VERSIONS snapshots stay available through version() so that
+    clients can be sent only what changed since the one they hold.
+
+    With interval_fn(host_id, kind) giving a switch's current poll interval,
+    a snapshot stays fresh for that interval plus TTL_SLACK instead of the
+    fixed ttl, so it never expires just before the next poll lands.
+    """
+    def __init__(self, ttl=SNAPSHOT_TTL, interval_fn=None):
+        self.ttl = ttl
+        self.interval_fn = interval_fn
+        self._lock = threading.Lock()
+        self._entries = {}  # (host_id, kind) -> (collected_at, data)
+        self._versions = {}  # (host_id, kind) -> deque of (version, collected_at, data), newest last
+        self._last_version = 0
+
+    def put(self, host_id, kind, data, collected_at=None):
+        collected_at = collected_at or time.time()
+        with self._lock:
+            self._entries[(host_id, kind)] = (collected_at, data)
+            self._last_version += 1
+            self._versions.setdefault((host_id, kind), deque(maxlen=KEPT_VERSIONS)).append(
+                (self._last_version, collected_at, data))
+        return collected_at
+
+    def get(self, host_id, kind, max_age=None):
+        """
+        Return the snapshot with age metadata, or None if missing or older
+        than max_age (defaults to the switch's TTL, see ttl_for).
+        """
+        max_age = self.ttl_for(host_id, kind) if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get((host_id, kind))
+            history = self._versions.get((host_id, kind))
+            version = history[-1][0] if history else None
+        if entry is None:
+            return None
+        collected_at, data = entry
+        age = time.time() - collected_at
+        if age > max_age:
+            return None
+        return {
+            'data': data,
+            'collected_at': collected_at,
+            'version': version,
+            'age': round(age, 1),
+            'expires_in': round(max_age - age, 1)
+        }
+
+    def ttl_for(self, host_id, kind):
+        if self.interval_fn is None:
+            return self.ttl
+        try:
+            return self.interval_fn(host_id, kind) + TTL_SLACK
+        except Exception:
+            return self.ttl
+
+    def version(self, host_id, kind, version):
+        """
+        Data of an earlier snapshot still kept, or None.
+        """
+        with self._lock:
+            for number, _, data in self._versions.get((host_id, kind), ()):
+                if number == version:
+                    return data
+        return None
+
+    def items(self, kind=None):
+        """
+        Snapshot of all entries as (host_id, kind, collected_at, data) tuples.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        return [(host_id, entry_kind, collected_at, data)
+                for (host_id, entry_kind), (collected_at, data) in entries
+                if kind is None or entry_kind == kind]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
@@ -1,34 +1,47 @@
 import paramiko
 import time
 import logging
-import sys
+import re
+import socket
+from logging_setup import configure_logging
+from instrumentation import instrumentation
 
 # Log file path
 log_file_path = "Switch_monitoring.log"
 
-# Initialize logger
-logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler(log_file_path, mode='w'),
-                        logging.StreamHandler(sys.stdout)
-                    ])
+SSH_PORT = 22
 
-# Redirect standard output and error to the log file
-class LoggerWriter:
-    def __init__(self, log_func):
-        self.log_func = log_func
+# Command reader settings
+COMMAND_TIMEOUT = 60        # Hard cap in seconds for a single command
+RECV_BUFFER = 65535
+TAIL_SIZE = 256             # Trailing characters scanned for prompts and pager markers
+PAGER_MARKER = 'More:'
+GENERIC_PROMPT = re.compile(r'\S+[#>]\s*$')
 
-    def write(self, message):
-        if message.strip():
-            self.log_func(message.strip())
+# Command that turns off terminal paging, per device platform
+DEFAULT_PLATFORM = 'cisco_sb'
+PAGING_COMMANDS = {
+    'cisco_sb': 'terminal datadump',       # Cisco Small Business (SG/SF/CBS)
+    'cisco_ios': 'terminal length 0',
+    'cisco_nxos': 'terminal length 0',
+    'dell': 'terminal length 0',
+    'aruba': 'no page',
+    'hp_procurve': 'no page',
+    'juniper': 'set cli screen-length 0',
+}
+COMMAND_ERROR_MARKERS = ('% Unrecognized', '% Invalid', 'Unknown command', 'Invalid input')
 
-    def flush(self):
-        pass
+# Initialize logger
+logger = logging.getLogger(__name__)
 
-sys.stdout = LoggerWriter(logger.info)
-sys.stderr = LoggerWriter(logger.error)
+def setup_cli_logging(level=None):
+    """
+    Log to the rotated Switch_monitoring.log and the console.
+
+    Only the command-line collectors call this; the Flask app configures
+    logging itself. Reports are printed to stdout, not logged.
+    """
+    configure_logging(log_file_path, level=level, console=True)
 
 class CustomSSHClient(paramiko.SSHClient):
     def _auth(self, username, password, *args, **kwargs):
@@ -45,12 +58,14 @@ class CustomSSHClient(paramiko.SSHClient):
             if not self._transport.is_authenticated():
                 raise
 
-def ssh_connect(host, username, password):
+def ssh_connect(host, username, password, port=SSH_PORT):
+    started = time.perf_counter()
     try:
         ssh_client = CustomSSHClient()
         ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         connection_params = {
             'hostname': host,
+            'port': int(port or SSH_PORT),
             'username': username,
             'password': password,
             'look_for_keys': True,
@@ -66,51 +81,204 @@ def ssh_connect(host, username, password):
         channel = ssh_client.invoke_shell()
         channel.settimeout(20)
         logger.info(f"Successfully connected to {host}")
+        instrumentation.observe('connect', time.perf_counter() - started, host=host)
         return ssh_client, channel
     except Exception as e:
+        instrumentation.observe('connect', time.perf_counter() - started, host=host, failed=1)
         logger.error(f"Connection error for {host}: {e}")
         print(f"Connection error for {host}: {e}")
         return None, None
 
-def send_command(channel, command, wait_time=5, expected_prompts=None):
-    try:
-        logger.info(f"Sending command: {command}")
-        channel.send(command + '\n')
-        output = ""
-        
-        # Wait for initial response
-        time.sleep(wait_time)
-        
-        # Buffer output until no more data or prompt is received
-        end_time = time.time() + 10  # Max 10 seconds additional wait
-        while time.time() < end_time:
-            if channel.recv_ready():
-                chunk = channel.recv(4096).decode('utf-8', errors='ignore')
-                output += chunk
-                # Reset timeout if we got data
-                end_time = time.time() + 2
-            if 'More:' in output:
-                before_more = output.split('More:')[0]
-                output = before_more
-                channel.send(' ')
-                time.sleep(1)
+def compile_prompt(prompt):
+    """
+    Build a regex matching the device prompt (hostname followed by '#' or '>')
+    at the end of the received output.
+    """
+    hostname = prompt.strip().rstrip('#>')
+    return re.compile(re.escape(hostname) + r'(?:\([^)]*\))?[#>]\s*$')
+
+def extract_prompt(output):
+    """
+    Return the trailing prompt line of output, or None if it does not end in one.
+    """
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    if lines and GENERIC_PROMPT.search(lines[-1]):
+        return lines[-1]
+    return None
+
+def learn_prompt(channel, timeout=10, settle=0.5):
+    """
+    Return the prompt the switch is sitting at, e.g. 'switch01#', or None if
+    no prompt could be recognised.
+
+    Reads until the channel has been quiet for settle seconds so that no
+    banner or prompt bytes are left behind for the next command.
+    """
+    for attempt in range(2):
+        if attempt:
+            channel.send('\n')
+        prompt = extract_prompt(_read_until_idle(channel, settle, timeout))
+        if prompt:
+            logger.info(f"Learned device prompt: {prompt}")
+            return prompt
+    logger.warning("Could not learn device prompt, falling back to '#'/'>' detection")
+    return None
+
+def _read_until_idle(channel, idle_timeout, timeout):
+    chunks = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        channel.settimeout(idle_timeout)
+        try:
+            data = channel.recv(RECV_BUFFER)
+        except socket.timeout:
+            break
+        if not data:
+            break
+        chunks.append(data.decode('utf-8', errors='ignore'))
+    return ''.join(chunks)
+
+def _read_until_prompt(channel, prompt_re, expected_prompts=None, timeout=COMMAND_TIMEOUT, idle_timeout=5,
+                       stats=None):
+    """
+    Stream bytes from channel until the device prompt comes back.
+
+    Without a known prompt the read also ends after idle_timeout seconds of
+    silence. Returns (output, received_bytes, pages). If a stats dict is
+    given, the seconds spent blocked waiting on the switch are added to
+    stats['wait'].
+    """
+    waited = 0.0
+    chunks = []
+    tail = ""
+    received = 0
+    pages = 0
+    page_start = 0
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logger.warning(f"Timed out after {timeout}s waiting for prompt")
+            break
+        channel.settimeout(min(remaining, idle_timeout))
+        recv_start = time.perf_counter()
+        try:
+            data = channel.recv(RECV_BUFFER)
+        except socket.timeout:
+            waited += time.perf_counter() - recv_start
+            if prompt_re is None or tail.rstrip().endswith(('#', '>')):
+                break
+            continue
+        waited += time.perf_counter() - recv_start
+        if not data:
+            break  # Channel closed by the switch
+        received += len(data)
+        text = data.decode('utf-8', errors='ignore')
+        chunks.append(text)
+        tail = (tail + text)[-TAIL_SIZE:]
+
+        # Pager fallback for sessions where paging could not be disabled
+        if PAGER_MARKER in tail:
+            page = ''.join(chunks[page_start:])
+            chunks[page_start:] = [page[:page.rfind(PAGER_MARKER)]]
+            page_start = len(chunks)
+            channel.send(' ')
+            pages += 1
+            tail = ""
+            continue
+
+        if expected_prompts:
+            answered = False
+            for prompt in expected_prompts:
+                if prompt['text'] in tail:
+                    logger.info(f"Responding to prompt: {prompt['text']}")
+                    channel.send(prompt['response'] + '\n')
+                    chunks = []  # Clear output after prompt response
+                    page_start = 0
+                    tail = ""
+                    answered = True
+                    break
+            if answered:
                 continue
-            if expected_prompts:
-                for prompt in expected_prompts:
-                    if prompt['text'] in output:
-                        logger.info(f"Responding to prompt: {prompt['text']}")
-                        channel.send(prompt['response'] + '\n')
-                        time.sleep(1)
-                        output = ""  # Clear output after prompt response
-                        end_time = time.time() + 10  # Reset timeout
-                        break
-            # Check for command prompt (assuming '#' or '>' indicates end)
-            if output.strip().endswith(('#', '>')):
+
+        if prompt_re is not None:
+            if prompt_re.search(tail):
                 break
-            time.sleep(0.5)  # Small delay to avoid busy-waiting
-        
-        logger.info(f"Full command output: {output}")
+        elif tail.rstrip().endswith(('#', '>')):
+            break
+    if stats is not None:
+        stats['wait'] = stats.get('wait', 0.0) + waited
+    return ''.join(chunks), received, pages
+
+def send_command(channel, command, wait_time=5, expected_prompts=None, prompt=None, timeout=COMMAND_TIMEOUT,
+                 host=None):
+    """
+    Send a command and return its output as soon as the device prompt reappears.
+
+    prompt is the prompt learned at login (see learn_prompt). Without it the
+    command is considered done when the output ends in '#'/'>' or after
+    wait_time seconds of silence. Each call is recorded as a 'command' span
+    (bytes, pages, time waiting on the switch vs processing) for host.
+    """
+    try:
+        logger.debug(f"Sending command: {command}")
+        # Drop anything left over from the previous command
+        while channel.recv_ready():
+            channel.recv(RECV_BUFFER)
+        prompt_re = compile_prompt(prompt) if prompt else None
+        start = time.perf_counter()
+        stats = {}
+        channel.send(command + '\n')
+        output, received, pages = _read_until_prompt(channel, prompt_re, expected_prompts,
+                                                     timeout=timeout, idle_timeout=wait_time, stats=stats)
+        elapsed = time.perf_counter() - start
+        instrumentation.observe('command', elapsed, host=host, name=command, bytes=received, pages=pages,
+                                wait_seconds=stats['wait'], process_seconds=max(elapsed - stats['wait'], 0.0))
+        logger.info(f"Command '{command}' completed in {elapsed:.3f}s ({received} bytes, {pages} pages)")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Full command output: {output}")
         return output
     except Exception as e:
         logger.error(f"Error sending command: {e}")
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+def clean_output(output, command=None):
+    """
+    Normalise raw CLI output: drop carriage returns, the echoed command line
+    and the trailing device prompt.
+    """
+    lines = [line.rstrip() for line in output.replace('\r', '').split('\n')]
+    while lines and not lines[0]:
+        lines.pop(0)
+    if command and lines and lines[0].endswith(command):
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    if lines and GENERIC_PROMPT.fullmatch(lines[-1].strip()):
+        lines.pop()
+    return '\n'.join(lines).strip('\n')
+
+def disable_paging(channel, platform=DEFAULT_PLATFORM, prompt=None):
+    """
+    Turn off terminal paging for the rest of the session.
+
+    Returns True on success. On unknown platforms or if the switch rejects
+    the command, send_command keeps answering 'More:' pages as a fallback.
+    """
+    command = PAGING_COMMANDS.get(platform)
+    if not command:
+        logger.warning(f"No paging command known for platform '{platform}', using pager fallback")
+        return False
+    output = send_command(channel, command, prompt=prompt)
+    if output.startswith('Error:') or any(marker in output for marker in COMMAND_ERROR_MARKERS):
+        logger.warning(f"'{command}' rejected by switch, using pager fallback")
+        return False
+    return True
+
+def enter_enable_mode(channel, username, password, prompt=None):
+    """
+    Enter privileged (enable) mode, answering the switch's login prompts.
+    """
+    prompts = [{'text': 'User Name:', 'response': username},
+               {'text': 'Password:', 'response': password}]
+    return send_command(channel, 'enable', expected_prompts=prompts, prompt=prompt)
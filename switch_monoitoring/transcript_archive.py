@@ -0,0 +1,269 @@
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from sshconnect import logger  # Import from sshconnect.py
+
+# Next to inventory.ini and the web app's log; shared by the app, the collectors and this CLI
+ARCHIVE_DIR = os.path.join(r"D:\Switch Monitoring tool", "transcripts")
+SEGMENT_BYTES = 16 * 1024 * 1024        # Compressed bytes per segment file before a new one is started
+SEGMENT_MAX_AGE = 86400                 # Seconds after its first run that a segment stops taking new ones
+MAX_ARCHIVE_BYTES = 1024 * 1024 * 1024  # Oldest segments are deleted beyond this total
+RETENTION_DAYS = 90                     # Segments whose newest run is older than this are deleted
+COMPRESS_LEVEL = 6
+MAINTENANCE_INTERVAL = 3600             # Seconds between retention passes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL, kind TEXT NOT NULL, collected_at REAL NOT NULL,
+    segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL,
+    raw_bytes INTEGER NOT NULL, sections TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS runs_by_host ON runs (host, kind, collected_at);
+CREATE INDEX IF NOT EXISTS runs_by_segment ON runs (segment);
+"""
+RUN_COLUMNS = ('id', 'host', 'kind', 'collected_at', 'segment', 'offset', 'length', 'raw_bytes', 'sections')
+
+
+class TranscriptArchive:
+    """
+    Compressed, indexed store of the command output of every collection.
+
+    Each run (one collector's sections for one switch) is written as its own
+    gzip member appended to the current segment file, so any run can be
+    read back with one seek and one decompress. A SQLite index maps host,
+    collector kind, section titles and time to (segment, offset, length),
+    and the latest run per (host, kind) is also kept in memory. Whole
+    segments are deleted oldest first once the archive exceeds
+    MAX_ARCHIVE_BYTES or RETENTION_DAYS, so disk use and lookups stay flat.
+
+    All processes append to the same active segment (the one holding the
+    newest run) until it reaches segment_bytes or SEGMENT_MAX_AGE; appends
+    happen inside the index's write transaction, so they never interleave.
+    Pruning runs from maybe_maintain() on the collection scheduler's
+    housekeeping, never from store().
+    """
+    def __init__(self, directory=ARCHIVE_DIR, segment_bytes=SEGMENT_BYTES, max_bytes=MAX_ARCHIVE_BYTES,
+                 retention_days=RETENTION_DAYS, segment_max_age=SEGMENT_MAX_AGE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_max_age = segment_max_age
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._latest = {}           # (host, kind) -> run dict
+        self._segment_count = 0     # segments started by this process, keeps new names unique
+        self._last_maintenance = 0
+
+    def store(self, host, kind, sections, collected_at=None):
+        """
+        Archive one collection's {section title: output}; returns the run id.
+        """
+        collected_at = collected_at or time.time()
+        raw = json.dumps(sections).encode('utf-8')
+        blob = gzip.compress(raw, COMPRESS_LEVEL)
+        titles = "\n".join(sections)
+        with self._lock:
+            # The write lock is taken before appending, so writers from other processes wait
+            self._conn.execute("BEGIN IMMEDIATE")
+            with self._conn:
+                segment, offset = self._append(blob, collected_at)
+                cursor = self._conn.execute(
+                    "INSERT INTO runs (host, kind, collected_at, segment, offset, length, raw_bytes, sections) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (host, kind, collected_at, segment, offset, len(blob), len(raw), titles))
+            run = dict(zip(RUN_COLUMNS, (cursor.lastrowid, host, kind, collected_at, segment, offset,
+                                         len(blob), len(raw), titles)))
+            self._latest[(host, kind)] = run
+        return run['id']
+
+    def latest(self, host, kind):
+        """
+        The newest run for (host, kind) with its sections, or None. A cached
+        run whose segment another process has pruned is looked up again.
+        """
+        for _ in range(2):
+            with self._lock:
+                run = self._latest.get((host, kind))
+                if run is None:
+                    row = self._conn.execute(
+                        f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE host = ? AND kind = ? "
+                        f"ORDER BY collected_at DESC LIMIT 1", (host, kind)).fetchone()
+                    if row is None:
+                        return None
+                    run = self._latest[(host, kind)] = dict(zip(RUN_COLUMNS, row))
+            try:
+                return self._with_sections(run)
+            except FileNotFoundError:
+                with self._lock:
+                    if self._latest.get((host, kind)) is run:
+                        del self._latest[(host, kind)]
+        return None
+
+    def runs(self, host, kind=None, section=None, start=None, end=None, limit=100):
+        """
+        Run metadata for a host between start and end (epoch seconds),
+        newest first, optionally limited to a kind and to runs that
+        contain a section title.
+        """
+        where = ["host = ?", "collected_at >= ?", "collected_at <= ?"]
+        params = [host, start or 0, end or time.time()]
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if section:
+            where.append("('\n' || sections || '\n') LIKE ?")
+            params.append(f"%\n{section}\n%")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE {' AND '.join(where)} "
+                f"ORDER BY collected_at DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(zip(RUN_COLUMNS, row)) for row in rows]
+
+    def read(self, run):
+        """
+        {section title: output} of a run returned by runs(), or None if its
+        segment was pruned meanwhile.
+        """
+        try:
+            return self._with_sections(run)['data']
+        except FileNotFoundError:
+            return None
+
+    def stats(self):
+        with self._lock:
+            runs, stored, raw, hosts, oldest = self._conn.execute(
+                "SELECT COUNT(*), SUM(length), SUM(raw_bytes), COUNT(DISTINCT host), MIN(collected_at) "
+                "FROM runs").fetchone()
+        return {'runs': runs, 'hosts': hosts, 'stored_bytes': stored or 0, 'raw_bytes': raw or 0,
+                'oldest': oldest}
+
+    def maintain(self, now=None):
+        """
+        Delete whole segments, oldest first, that are past retention or
+        beyond the size limit, together with their index rows.
+
+        Uses its own connection, so store() and lookups are not blocked
+        while it runs; call it from a background thread (see maybe_maintain).
+        """
+        now = now or time.time()
+        self._last_maintenance = now
+        cutoff = now - self.retention_days * 86400
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=60)
+        try:
+            active = self._active_segment(conn)
+            segments = conn.execute(
+                "SELECT segment, SUM(length), MAX(collected_at) FROM runs "
+                "GROUP BY segment ORDER BY MAX(collected_at)").fetchall()
+            total = sum(size for _, size, _ in segments)
+            expired = []
+            for segment, size, newest in segments:
+                if segment == active[0]:
+                    continue    # Still being appended to
+                if newest >= cutoff and total <= self.max_bytes:
+                    break
+                expired.append(segment)
+                total -= size
+            if not expired:
+                return
+            with conn:
+                conn.executemany("DELETE FROM runs WHERE segment = ?", [(name,) for name in expired])
+        finally:
+            conn.close()
+        with self._lock:
+            self._latest = {key: run for key, run in self._latest.items() if run['segment'] not in expired}
+        for segment in expired:
+            try:
+                os.remove(os.path.join(self.directory, segment))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Transcript archive: removed {len(expired)} old segments")
+
+    def maybe_maintain(self, now=None):
+        """
+        Run maintain() once MAINTENANCE_INTERVAL has passed; meant for the
+        collection scheduler's thread, never the collection path.
+        """
+        now = now or time.time()
+        if now - self._last_maintenance >= MAINTENANCE_INTERVAL:
+            try:
+                self.maintain(now)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Transcript archive maintenance failed: {e}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _active_segment(self, conn=None):
+        """
+        (name, time of its first run) of the segment holding the newest run, or (None, None).
+        """
+        row = (conn or self._conn).execute(
+            "SELECT segment, (SELECT MIN(collected_at) FROM runs AS first WHERE first.segment = newest.segment) "
+            "FROM runs AS newest ORDER BY id DESC LIMIT 1").fetchone()
+        return tuple(row) if row else (None, None)
+
+    def _append(self, blob, collected_at):
+        # Called inside the index write transaction
+        segment, started = self._active_segment()
+        path = os.path.join(self.directory, segment) if segment else None
+        if (segment is None or not os.path.exists(path)
+                or os.path.getsize(path) + len(blob) > self.segment_bytes
+                or collected_at - started > self.segment_max_age):
+            while True:
+                self._segment_count += 1
+                segment = f"{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}-{self._segment_count}.gz"
+                path = os.path.join(self.directory, segment)
+                if not os.path.exists(path):
+                    break
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(blob)
+        return segment, offset
+
+    def _with_sections(self, run):
+        with open(os.path.join(self.directory, run['segment']), 'rb') as f:
+            f.seek(run['offset'])
+            blob = f.read(run['length'])
+        return {**run, 'data': json.loads(gzip.decompress(blob))}
+
+
+def main():
+    """
+    python transcript_archive.py latest <host> <system|interface>
+    python transcript_archive.py list <host> [kind] [days]
+    python transcript_archive.py stats
+    """
+    if len(sys.argv) < 2 or sys.argv[1] not in ('latest', 'list', 'stats'):
+        print(main.__doc__)
+        sys.exit(1)
+    archive = TranscriptArchive()
+    if sys.argv[1] == 'stats':
+        print(archive.stats())
+    elif sys.argv[1] == 'latest':
+        run = archive.latest(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else 'system')
+        if run is None:
+            print("No archived run found")
+            sys.exit(1)
+        print(f"Run {run['id']} collected {time.ctime(run['collected_at'])}")
+        for section, output in run['data'].items():
+            print(f"\n=== {section} ===")
+            print(output)
+    else:
+        days = float(sys.argv[4]) if len(sys.argv) > 4 else 1
+        for run in archive.runs(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None,
+                                start=time.time() - days * 86400):
+            print(f"{run['id']:>8} {time.ctime(run['collected_at'])} {run['kind']:<10} "
+                  f"{run['length']:>8} bytes ({run['raw_bytes']} raw)")
+
+if __name__ == "__main__":
+    main()